@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+
+# Cosine similarity above which a new question reuses a cached answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+# How long a cached answer stays valid
+ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", 24))
+# Total answers kept across all companies, least recently used are evicted first
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+
+class AnswerCache:
+    """Semantic cache of LLM answers, keyed by company and question embedding.
+
+    A lookup returns a stored answer when a previous question for the same
+    company is within ``threshold`` cosine similarity and younger than the
+    TTL. Entries for a company are dropped whenever its store is re-ingested.
+    """
+
+    def __init__(self, cache_path, threshold=None, ttl_hours=None, max_entries=None):
+        self.threshold = ANSWER_CACHE_THRESHOLD if threshold is None else threshold
+        self.ttl_seconds = (ANSWER_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+        self.max_entries = ANSWER_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                   id INTEGER PRIMARY KEY,
+                   company TEXT NOT NULL,
+                   question TEXT NOT NULL,
+                   embedding BLOB NOT NULL,
+                   answer TEXT NOT NULL,
+                   model TEXT,
+                   sources TEXT NOT NULL,
+                   created_at REAL NOT NULL,
+                   last_used REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_company ON answers (company, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, company_name, query_embedding):
+        """Return the best cached entry as a dict, or None on a miss."""
+        query = self._normalize(query_embedding)
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, embedding FROM answers WHERE company = ? AND created_at >= ?",
+                (company_name, cutoff),
+            ).fetchall()
+            if not rows:
+                return None
+
+            matrix = np.frombuffer(b"".join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), -1)
+            if matrix.shape[1] != query.shape[0]:
+                return None
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            entry_id = rows[best][0]
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+            self._conn.commit()
+            question, answer, model, sources = self._conn.execute(
+                "SELECT question, answer, model, sources FROM answers WHERE id = ?", (entry_id,)
+            ).fetchone()
+
+        return {
+            "question": question,
+            "answer": answer,
+            "model": model,
+            "sources": json.loads(sources),
+            "similarity": float(scores[best]),
+        }
+
+    def put(self, company_name, question, query_embedding, answer, model, docs=()):
+        """Store an answer with the (content, metadata) of the documents it was based on."""
+        embedding = self._normalize(query_embedding).tobytes()
+        sources = json.dumps([
+            {"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs
+        ])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (company, question, embedding, answer, model, sources, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (company_name, question, embedding, answer, model, sources, now, now),
+            )
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE id IN ("
+                "SELECT id FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def invalidate_company(self, company_name):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE company = ?", (company_name,))
+            self._conn.commit()
+
+def invalidate_company_answers(cache_root, company_name):
+    """Drop a company's cached answers; called when its vectorstore is rebuilt."""
+    cache_path = os.path.join(cache_root, "answer_cache.sqlite3")
+    if os.path.exists(cache_path):
+        cache = AnswerCache(cache_path)
+        try:
+            cache.invalidate_company(company_name)
+        finally:
+            cache.close()
@@ -3,78 +3,88 @@ import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 import os
 import shutil
-import json
-import requests
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import time
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from langchain.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
+from langchain_core.documents import Document
+from embedding_cache import CachedEmbeddings
+from embedding_backends import create_embeddings, embedding_signature
+from answer_cache import AnswerCache
+from ingest_jobs import IngestJobRunner, ACTIVE_STATUSES as ACTIVE_INGEST_STATUSES
+from llm_client import GeminiClient, iter_stream_text, context_token_budget
+from vectorstore_registry import registry as vectorstore_registry, invalidate_vectorstore
+from retrieval import hybrid_search, hybrid_search_by_company
+from reranker import RERANK_ENABLED, RERANK_FETCH_K, rerank_documents
+from context_builder import build_context, describe_context
+from file_catalog import pdf_catalog, library_summary, pdf_bytes
+from company_catalog import list_companies, company_pdf_names, company_logo
+import metrics
+from metrics import timed, company_context
+from lexical_index import LexicalIndex, LEXICAL_INDEX_FILENAME
+from compact_store import CompactVectorStore, VECTOR_STORAGE
+from unified_index import UNIFIED_INDEX, UNIFIED_INDEX_DIRNAME, unified_index_directory, purge_company
+from store_versions import current_store_directory
+from store_health import check_store, describe_problems, StoreCorruptError
 
 # --- NEW: Cached function to load the embedding model ---
 @st.cache_resource
 def load_embedding_model():
-    """Loads the sentence transformer model only once."""
-    return SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    """Loads the configured embedding backend only once, behind the on-disk embedding cache."""
+    cache_root = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+    return CachedEmbeddings(
+        create_embeddings(),
+        model_name=embedding_signature(),
+        cache_path=os.path.join(cache_root, "embedding_cache.sqlite3"),
+    )
 
 # Detect if running on Streamlit Cloud
 def is_streamlit_cloud():
     return os.environ.get("HOME") == "/home/adminuser"
 
-def create_chroma_vectorstore(vectorstore_path, company_name, max_retries=5):
-    """Create Chroma vectorstore with enhanced retry logic and company-specific caching"""
-    for attempt in range(max_retries):
+def create_chroma_vectorstore(vectorstore_path, company_name):
+    """Open a company's Chroma vectorstore"""
+    os.makedirs(vectorstore_path, exist_ok=True)
+
+    # --- MODIFIED: Use the cached function to get the model ---
+    embedding_function = load_embedding_model()
+
+    vectorstore = Chroma(
+        persist_directory=vectorstore_path,
+        embedding_function=embedding_function,
+        client_settings=None
+    )
+
+    vectorstore._client.heartbeat()
+    return vectorstore
+
+def open_vectorstore(vectorstore_path, company_name):
+    """Open a store in the configured format (Chroma, or the int8 compact store).
+
+    A store that fails to open is checked once instead of being retried; a
+    damaged one raises ``StoreCorruptError`` saying what is wrong with it.
+    """
+    with timed("vectorstore_open", company_name):
         try:
-            # Clear any existing chroma client for this company
-            vectorstore_key = f'vectorstore_{company_name}'
-            if vectorstore_key in st.session_state:
-                del st.session_state[vectorstore_key]
-            
-            os.makedirs(vectorstore_path, exist_ok=True)
-            
-            # --- MODIFIED: Use the cached function to get the model ---
-            embedding_function = load_embedding_model()
-            
-            vectorstore = Chroma(
-                persist_directory=vectorstore_path,
-                embedding_function=embedding_function,
-                client_settings=None
-            )
-            
-            vectorstore._client.heartbeat()
-            return vectorstore
-            
+            if VECTOR_STORAGE == "compact":
+                return CompactVectorStore(vectorstore_path, load_embedding_model())
+            return create_chroma_vectorstore(vectorstore_path, company_name)
         except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = 2 * (attempt + 1)
-                time.sleep(wait_time)
-                
-                # More aggressive cleanup on retry
-                if os.path.exists(vectorstore_path):
-                    try:
-                        for file in os.listdir(vectorstore_path):
-                            if file.endswith('.sqlite3') or file.endswith('.db'):
-                                file_path = os.path.join(vectorstore_path, file)
-                                try:
-                                    os.remove(file_path)
-                                except:
-                                    pass
-                    except:
-                        pass
-            else:
-                raise e
-
-def get_company_logo(company_name):
-    """Get company logo if it exists"""
-    logo_path = os.path.join("data/logos", f"{company_name}.png")
-    if os.path.exists(logo_path):
-        return Image.open(logo_path)
-    return None
+            problems = check_store(vectorstore_path)
+            if not problems:
+                raise
+            raise StoreCorruptError(f"Knowledge base of {company_name} is damaged: "
+                                    f"{describe_problems(problems)}") from e
+
+def get_company_logo(company_name, size=50):
+    """Get company logo thumbnail if it exists"""
+    return company_logo("data/logos", company_name, size)
 
 def display_company_with_logo(company_name, size=50):
     """Display company name with logo if available"""
-    logo = get_company_logo(company_name)
+    logo = get_company_logo(company_name, size)
     if logo:
         col1, col2 = st.columns([1, 4])
         with col1:
@@ -105,74 +115,304 @@ def check_admin_password():
     return True
 
 def clear_company_vectorstore_cache(company_name):
-    """Clear vectorstore cache for a specific company"""
-    vectorstore_key = f'vectorstore_{company_name}'
-    if vectorstore_key in st.session_state:
-        del st.session_state[vectorstore_key]
+    """Clear the shared vectorstore for a specific company"""
+    invalidate_vectorstore(company_name)
 
 def get_company_vectorstore(company_name, vectorstore_path):
-    """Get or create company-specific vectorstore with proper caching"""
-    vectorstore_key = f'vectorstore_{company_name}'
-    
-    if vectorstore_key not in st.session_state:
-        st.session_state[vectorstore_key] = create_chroma_vectorstore(vectorstore_path, company_name)
-    
-    return st.session_state[vectorstore_key]
+    """Get or create company-specific vectorstore from the process-wide registry.
+
+    ``vectorstore_path`` is the published store version
+    (``current_store_directory``); a new version is opened once it is published.
+    A damaged store is rebuilt from the company's PDFs by a background job.
+    """
+    try:
+        return vectorstore_registry.get(
+            company_name,
+            vectorstore_path,
+            lambda: open_vectorstore(vectorstore_path, company_name)
+        )
+    except StoreCorruptError:
+        vectorstore_root = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+        get_ingest_runner().submit(company_name, os.path.join(vectorstore_root, company_name), full_rebuild=True)
+        raise
+
+def get_unified_vectorstore(vectorstore_root):
+    """Get the vectorstore shared by all companies in unified index mode"""
+    unified_path = unified_index_directory(vectorstore_root)
+    return vectorstore_registry.get(
+        UNIFIED_INDEX_DIRNAME,
+        unified_path,
+        lambda: open_vectorstore(unified_path, UNIFIED_INDEX_DIRNAME)
+    )
+
+def remove_company_from_unified_index(company_name, vectorstore_root):
+    """Delete a company's chunks from the shared vector and keyword indexes"""
+    lexical_path = os.path.join(unified_index_directory(vectorstore_root), LEXICAL_INDEX_FILENAME)
+    lexical_index = LexicalIndex(lexical_path) if os.path.exists(lexical_path) else None
+    try:
+        purge_company(get_unified_vectorstore(vectorstore_root), lexical_index, company_name)
+    finally:
+        if lexical_index is not None:
+            lexical_index.close()
+
+@st.cache_resource
+def get_ingest_runner():
+    """One background ingestion runner per process, with jobs tracked beside the vectorstores."""
+    jobs_root = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+    return IngestJobRunner(os.path.join(jobs_root, "ingest_jobs.sqlite3"))
+
+def render_ingest_job(job, cancellable=True):
+    """Show the progress or outcome of an ingestion job"""
+    status = job["status"]
+    if status in ACTIVE_INGEST_STATUSES:
+        fraction = job["files_done"] / job["files_total"] if job["files_total"] else 0.0
+        st.progress(min(fraction, 1.0), text=f"🔄 {job['message']}")
+        st.caption(f"{job['files_done']}/{job['files_total']} files · {job['chunks_written']} chunks stored")
+        if cancellable and st.button("⏹️ Cancel", key=f"cancel_ingest_{job['id']}"):
+            get_ingest_runner().cancel(job["id"])
+    elif status == "succeeded":
+        st.success("✅ Knowledge base updated successfully!")
+    elif status == "cancelled":
+        st.warning(f"⏹️ {job['message']}")
+    else:
+        st.error(f"❌ Error: {job['error'] or job['message']}")
+
+@st.fragment(run_every=2)
+def poll_ingest_job(company_name):
+    """Re-render the running job every couple of seconds; rerun the app once it finishes"""
+    job = get_ingest_runner().latest_for_company(company_name)
+    render_ingest_job(job)
+    if job["status"] not in ACTIVE_INGEST_STATUSES:
+        st.rerun()
+
+def render_store_rebuild(company_name, error_msg):
+    """Explain that a damaged knowledge base is being rebuilt, with the rebuild job's status"""
+    st.warning(f"🛠️ {error_msg}")
+    st.info("🔄 A rebuild from the uploaded PDFs has been queued - ask again once it has finished.")
+    job = get_ingest_runner().latest_for_company(company_name)
+    if job is not None:
+        render_ingest_job(job, cancellable=False)
+
+def show_ingest_status(company_name):
+    """Show the latest ingestion job of a company, polling it while it runs"""
+    job = get_ingest_runner().latest_for_company(company_name)
+    if job is None:
+        return
+    if job["status"] in ACTIVE_INGEST_STATUSES:
+        poll_ingest_job(company_name)
+    else:
+        render_ingest_job(job)
 
 def get_uploaded_pdfs(company_name):
     """Get list of uploaded PDFs for a company"""
-    company_pdf_dir = os.path.join("data/pdfs", company_name)
-    if os.path.exists(company_pdf_dir):
-        return [f for f in os.listdir(company_pdf_dir) if f.endswith(".pdf")]
-    return []
-
-def call_gemini_with_fallback(payload):
-    """Call Gemini API with automatic model fallback on rate limit"""
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    headers = {"Content-Type": "application/json"}
+    return company_pdf_names("data/pdfs", company_name)
+
+@st.cache_resource
+def get_answer_cache():
+    """Process-wide semantic cache of answers, stored beside the vectorstores."""
+    cache_root = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+    return AnswerCache(os.path.join(cache_root, "answer_cache.sqlite3"))
+
+@st.cache_resource
+def get_metrics_store():
+    """Process-wide store of per-stage timings, kept beside the vectorstores."""
+    metrics_root = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+    return metrics.configure(os.path.join(metrics_root, metrics.METRICS_FILENAME))
+
+@st.cache_resource
+def get_llm_client():
+    """One pooled Gemini client per process, so rate-limit budgets are shared by all sessions."""
+    return GeminiClient(os.getenv("GEMINI_API_KEY"), base_url=os.getenv("GEMINI_API_BASE"))
+
+def call_gemini_with_fallback(payload, notices=None):
+    """Call Gemini API, picking the preferred model that still has rate-limit budget
+
+    When ``notices`` is a list, warnings/errors are appended to it as
+    (level, message) instead of being rendered, so the call can run off the
+    script thread.
+    """
+    def notify(level, message):
+        if notices is not None:
+            notices.append((level, message))
+        elif level == "warning":
+            st.warning(message)
+        else:
+            st.error(message)
+
+    return get_llm_client().generate(payload, notify=notify)
+
+def call_gemini_stream_with_fallback(payload):
+    """Streaming variant of call_gemini_with_fallback; read the answer with iter_stream_text"""
+    def notify(level, message):
+        if level == "warning":
+            st.warning(message)
+        else:
+            st.error(message)
+
+    return get_llm_client().generate_stream(payload, notify=notify)
     
-    for attempt in range(len(GEMINI_MODELS)):
-        current_model = GEMINI_MODELS[st.session_state.current_model_index]
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{current_model}:generateContent?key={GEMINI_API_KEY}"
-        
+def render_source_documents(docs, key_prefix, company_pdf_dir=None):
+    """Show the top source documents with download links.
+
+    ``company_pdf_dir`` resolves the source by file name inside the company
+    folder; without it the stored source path is used as is.
+    """
+    if not docs:
+        return
+    with st.expander("📚 Source Documents"):
+        for i, doc in enumerate(docs[:3]):
+            st.markdown(f"**Source {i+1}:**")
+            st.text(doc.page_content[:500] + "...")
+
+            # Add download link if source information is available
+            if 'source' in doc.metadata:
+                source_file = doc.metadata['source']
+                if company_pdf_dir:
+                    file_path = os.path.join(company_pdf_dir, os.path.basename(source_file))
+                else:
+                    file_path = source_file
+                if os.path.exists(file_path):
+                    st.download_button(
+                        label=f"Download {os.path.basename(source_file)}",
+                        data=pdf_bytes(file_path),
+                        file_name=os.path.basename(source_file),
+                        mime="application/pdf",
+                        key=f"{key_prefix}_{i}"
+                    )
+            st.markdown("---")
+
+def prompt_token_budget():
+    """Context budget of the model the request will most likely go to"""
+    return context_token_budget(get_llm_client().likely_model())
+
+def build_prompt_context(docs):
+    """Token-budgeted context, sized for the model the request will most likely go to"""
+    return build_context(docs, prompt_token_budget())
+
+def cached_source_documents(cached):
+    """Rebuild Documents from the sources stored with a cached answer"""
+    return [Document(page_content=source["page_content"], metadata=source["metadata"])
+            for source in cached["sources"]]
+
+def ask_company_general_question(company, general_query, vectorstore_path, query_embedding, answer_cache,
+                                 docs=None):
+    """Retrieve context and query Gemini for one company of the General Chat fan-out.
+
+    Runs in a worker thread, so it renders nothing; warnings and errors are
+    collected in the returned result and rendered by the main script thread.
+    ``docs`` skips retrieval when the context was already fetched (unified index).
+    """
+    result = {"company": company, "docs": [], "context": None, "response": None, "used_model": None,
+              "notices": [], "error": None, "store_corrupt": False, "cached": None}
+    # Timings recorded in this worker thread are attributed to the company
+    with company_context(company):
         try:
-            time.sleep(0.5)
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
-            
-            if response.status_code == 200:
-                return response, current_model
-            elif response.status_code == 429:
-                st.warning(f"⚠️ Rate limit reached for {current_model}, trying next model...")
-                # Switch to next model
-                st.session_state.current_model_index = (st.session_state.current_model_index + 1) % len(GEMINI_MODELS)
-                time.sleep(2)  # Wait before trying next model
-                continue
-            else:
-                return response, current_model
-                
+            with timed("answer_cache_lookup"):
+                result["cached"] = answer_cache.get(company, query_embedding)
+            if result["cached"]:
+                return result
+
+            if docs is None:
+                # Get company-specific vectorstore
+                store_path = current_store_directory(vectorstore_path)
+                vectorstore = get_company_vectorstore(company, store_path)
+
+                with timed("retrieval"):
+                    docs = hybrid_search(vectorstore, store_path, general_query, query_embedding,
+                                         k=RETRIEVAL_FETCH_K)
+            with timed("rerank"):
+                docs = rerank_documents(general_query, docs, top_n=RETRIEVAL_K, token_budget=prompt_token_budget())
+            with timed("prompt_build"):
+                context = build_prompt_context(docs)
+            docs = context["docs"]
+
+            payload = {
+                "contents": [{
+                    "parts": [{
+                        "text": f""" As a professional insurance broker assistant, answer the following question using ONLY the context provided for {company}.
+
+    Question: {general_query}
+
+    Context from {company}: {context['text']}
+
+    Please provide a clear, professional response that would be helpful for insurance brokers and their clients. Base your answer ONLY on the provided context from {company}.
+    """
+                    }]
+                }]
+            }
+
+            result["docs"] = docs
+            result["context"] = context
+            with timed("llm"):
+                result["response"], result["used_model"] = call_gemini_with_fallback(payload, notices=result["notices"])
+        except StoreCorruptError as e:
+            # A rebuild has been queued by get_company_vectorstore
+            result["error"], result["store_corrupt"] = str(e), True
         except Exception as e:
-            st.error(f"❌ Error with {current_model}: {str(e)}")
-            st.session_state.current_model_index = (st.session_state.current_model_index + 1) % len(GEMINI_MODELS)
-            continue
-    
-    # If all models failed, return the last response
-    return response, current_model
-    
+            result["error"] = str(e)
+    return result
+
+def render_general_answer(company, general_query, result, query_embedding, answer_cache):
+    """Render one company's General Chat answer (main script thread only)."""
+    with timed("render", company):
+        _render_general_answer(company, general_query, result, query_embedding, answer_cache)
+
+def _render_general_answer(company, general_query, result, query_embedding, answer_cache):
+    for level, message in result["notices"]:
+        if level == "warning":
+            st.warning(message)
+        else:
+            st.error(message)
+
+    if result["store_corrupt"]:
+        render_store_rebuild(company, result["error"])
+        return
+    if result["error"] is not None:
+        st.error(f"❌ Error accessing knowledge base: {result['error']}")
+        st.info("💡 Try using admin access to click 'Relearn PDFs' to rebuild the knowledge base.")
+        clear_company_vectorstore_cache(company)
+        return
+
+    company_pdf_dir = os.path.join("data/pdfs", company)
+    key_prefix = f"download_general_{company}_{hash(general_query)}"
+    if result["cached"]:
+        cached = result["cached"]
+        st.info(f"⚡ Answered from cache ({cached['model']}) - similar question: \"{cached['question']}\"")
+        st.success(cached["answer"])
+        render_source_documents(cached_source_documents(cached), key_prefix, company_pdf_dir)
+        return
+
+    response, used_model, docs = result["response"], result["used_model"], result["docs"]
+    st.info(f"🤖 Using model: {used_model}")
+    st.caption(describe_context(result["context"]))
+
+    if response.status_code == 200:
+        try:
+            answer = response.json()['candidates'][0]['content']['parts'][0]['text']
+            st.success(answer)
+            answer_cache.put(company, general_query, query_embedding, answer, used_model, docs[:3])
+
+            # Show source documents with download links
+            render_source_documents(docs, key_prefix, company_pdf_dir)
+
+        except Exception as e:
+            st.error("❌ Error parsing response from Gemini")
+    else:
+        st.error(f"❌ Gemini API Error: {response.status_code}")
+
 # Load environment variables
 load_dotenv()
 
-# Gemini model fallback configuration (ordered by preference)
-GEMINI_MODELS = [
-    "gemini-2.5-flash",           # 15 RPM, 1M TPM, 1000 RPD
-    "gemini-2.5-flash-lite-preview-06-17",  # 15 RPM, 250K TPM, 1000 RPD  
-    "gemini-2.0-flash",           # 10 RPM, 250K TPM, 250 RPD
-    "gemini-2.0-flash-lite",      # 30 RPM, 1M TPM, 200 RPD
-    "gemini-2.5-pro"              # 5 RPM, 250K TPM, 100 RPD
-]
+# Stream Ask Questions answers token by token (set STREAM_RESPONSES=false to disable)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() not in ("0", "false", "no")
+
+# Number of chunks retrieved per question
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", 4))
+# Candidates retrieved per question - over-fetched when the reranker picks the final chunks
+RETRIEVAL_FETCH_K = max(RETRIEVAL_K, RERANK_FETCH_K) if RERANK_ENABLED else RETRIEVAL_K
 
-# Initialize session state for model tracking
-if 'current_model_index' not in st.session_state:
-    st.session_state.current_model_index = 0
+# Maximum number of companies queried at once in General Chat
+GENERAL_CHAT_CONCURRENCY = int(os.getenv("GENERAL_CHAT_CONCURRENCY", 8))
 
 # Initialize session state
 if 'selected_company' not in st.session_state:
@@ -191,6 +431,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Start recording stage timings for this process
+get_metrics_store()
+
 # Custom CSS for professional styling
 st.markdown("""
 <style>
@@ -362,8 +605,7 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### 📁 Select Company")
     
-    company_folders = [f for f in os.listdir(company_base_dir) 
-                      if os.path.isdir(os.path.join(company_base_dir, f))]
+    company_folders = list_companies(company_base_dir)
     
     if not company_folders:
         st.warning("⚠️ No companies found. Use admin access to add companies.")
@@ -374,16 +616,13 @@ with st.sidebar:
             col1, col2 = st.columns([3, 1])
             with col1:
                 if st.button(f"📂 {company}", key=f"select_{company}"):
-                    # Clear vectorstore cache when switching companies
-                    if st.session_state.selected_company and st.session_state.selected_company != company:
-                        clear_company_vectorstore_cache(st.session_state.selected_company)
-                    
+                    # Vectorstores are shared across sessions, so switching keeps them open
                     st.session_state.selected_company = company
                     st.session_state.upload_success_message = None
                     st.rerun()
             
             with col2:
-                logo = get_company_logo(company)
+                logo = get_company_logo(company, size=30)
                 if logo:
                     st.image(logo, width=30)
 
@@ -391,6 +630,10 @@ with st.sidebar:
     if admin_authenticated:
         st.markdown('<div class="success-zone">', unsafe_allow_html=True)
         st.success("🔓 Admin Mode Active")
+
+        if st.button("📈 Metrics", key="view_metrics", use_container_width=True):
+            st.session_state.current_view = "Metrics"
+            st.rerun()
         
         # Add new company
         st.markdown("#### ➕ Add New Company")
@@ -467,60 +710,21 @@ with st.sidebar:
         st.markdown("---")
         st.markdown("### ⚙️ Admin Actions")
         
-        # Enhanced Relearn PDFs
+        # Relearn PDFs runs as a background job; the sidebar only polls its status
         if st.button("🔄 Relearn PDFs"):
-            try:
-                from ingest import ingest_company_pdfs
-                
-                with st.spinner("🔄 Rebuilding knowledge base..."):
-                    VECTORSTORE_ROOT = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
-                    vectorstore_path = os.path.join(VECTORSTORE_ROOT, selected_company)
-                    
-                    # Clear the cached vectorstore
-                    clear_company_vectorstore_cache(selected_company)
-                    
-                    # Remove existing vectorstore
-                    if os.path.exists(vectorstore_path):
-                        try:
-                            shutil.rmtree(vectorstore_path, ignore_errors=True)
-                            time.sleep(2)
-                        except Exception as cleanup_error:
-                            st.warning(f"⚠️ Cleanup warning: {cleanup_error}")
-                    
-                    os.makedirs(vectorstore_path, exist_ok=True)
-                    
-                    # Progress indicator
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    status_text.text("📖 Processing PDFs...")
-                    progress_bar.progress(25)
-                    
-                    # Run the ingestion
-                    vectordb = ingest_company_pdfs(selected_company, persist_directory=vectorstore_path)
-                    
-                    progress_bar.progress(75)
-                    status_text.text("✅ Finalizing...")
-                    
-                    time.sleep(1)
-                    
-                    progress_bar.progress(100)
-                    status_text.text("🎉 Complete!")
-                    
-                    st.success("✅ Knowledge base updated successfully!")
-                    
-                    time.sleep(1)
-                    st.rerun()
-                    
-            except Exception as e:
-                error_msg = str(e)
-                if "no such table: tenants" in error_msg:
-                    st.error("❌ Database corruption detected. Please try again - this usually resolves the issue.")
-                    st.info("💡 If the problem persists, try deleting and re-adding the company data.")
-                else:
-                    st.error(f"❌ Error: {error_msg}")
-                
-                clear_company_vectorstore_cache(selected_company)
+            VECTORSTORE_ROOT = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+            vectorstore_path = os.path.join(VECTORSTORE_ROOT, selected_company)
+            
+            # The existing vectorstore is kept - ingestion only re-embeds
+            # new or changed PDFs and drops chunks of removed ones
+            os.makedirs(vectorstore_path, exist_ok=True)
+            get_ingest_runner().submit(selected_company, vectorstore_path)
+        
+        show_ingest_status(selected_company)
+        
+        other_jobs = [job for job in get_ingest_runner().active_jobs() if job["company"] != selected_company]
+        if other_jobs:
+            st.caption("⏳ Also ingesting: " + ", ".join(job["company"] for job in other_jobs))
         
         # Delete company data
         st.markdown('<div class="danger-zone">', unsafe_allow_html=True)
@@ -529,6 +733,11 @@ with st.sidebar:
         if st.button("🗑️ Delete All Company Data", type="secondary"):
             if st.button("⚠️ CONFIRM DELETE", key="confirm_delete"):
                 try:
+                    # Stop any ingestion still writing to this company's store
+                    running_job = get_ingest_runner().latest_for_company(selected_company)
+                    if running_job and running_job["status"] in ACTIVE_INGEST_STATUSES:
+                        get_ingest_runner().cancel(running_job["id"])
+                    
                     # Clear vectorstore cache
                     clear_company_vectorstore_cache(selected_company)
                     
@@ -542,6 +751,8 @@ with st.sidebar:
                     vectorstore_path = os.path.join(VECTORSTORE_ROOT, selected_company)
                     if os.path.exists(vectorstore_path):
                         shutil.rmtree(vectorstore_path)
+                    if UNIFIED_INDEX:
+                        remove_company_from_unified_index(selected_company, VECTORSTORE_ROOT)
                     
                     # Delete logo
                     logo_path = os.path.join(logos_dir, f"{selected_company}.png")
@@ -602,8 +813,7 @@ if st.session_state.current_view == "General Chat":
     
     # Check if companies exist
     company_base_dir = "data/pdfs"
-    company_folders = [f for f in os.listdir(company_base_dir) 
-                      if os.path.isdir(os.path.join(company_base_dir, f))]
+    company_folders = list_companies(company_base_dir)
     
     if not company_folders:
         st.info("👈 No companies found. Please use admin access in the sidebar to add companies first.")
@@ -611,95 +821,72 @@ if st.session_state.current_view == "General Chat":
         general_query = st.text_input("🔍 Enter your question for all companies:", placeholder="Ask a general question...")
         
         if general_query:
+            question_start = time.perf_counter()
             st.info("Fetching responses from all companies...")
             
             VECTORSTORE_ROOT = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
             
+            # One placeholder per company keeps the page order stable while
+            # answers arrive in whatever order they complete
+            slots = {}
             for company in company_folders:
-                vectorstore_path = os.path.join(VECTORSTORE_ROOT, company)
-                
-                if os.path.exists(vectorstore_path):
-                    st.markdown(f"### 🏢 Response from {company}")
-                    try:
-                        # Get company-specific vectorstore
-                        vectorstore = get_company_vectorstore(company, vectorstore_path)
-                        
-                        retriever = vectorstore.as_retriever()
-                        docs = retriever.get_relevant_documents(general_query)
-                        context = """
-
-""".join([doc.page_content for doc in docs])
-                        
-                        payload = {
-                            "contents": [{
-                                "parts": [{
-                                    "text": f""" As a professional insurance broker assistant, answer the following question using ONLY the context provided for {company}.
-
-Question: {general_query}
-
-Context from {company}: {context}
-
-Please provide a clear, professional response that would be helpful for insurance brokers and their clients. Base your answer ONLY on the provided context from {company}.
-"""
-                                }]
-                            }]
-                        }
+                container = st.container()
+                with container:
+                    vectorstore_path = os.path.join(VECTORSTORE_ROOT, company)
+                    if os.path.exists(vectorstore_path):
+                        st.markdown(f"### 🏢 Response from {company}")
+                        slots[company] = (vectorstore_path, st.empty())
+                        slots[company][1].caption("⏳ Waiting for response...")
+                    else:
+                        st.warning(f"⚠️ Knowledge base not found for {company}.")
+                    st.markdown("---")
+            
+            # Embed the question once for every company's cache lookup and retrieval
+            with timed("query_embedding"):
+                query_embedding = load_embedding_model().embed_query(general_query)
+            answer_cache = get_answer_cache()
 
-                        response, used_model = call_gemini_with_fallback(payload)
-                        st.info(f"🤖 Using model: {used_model}")
+            # With a unified index, one filtered query retrieves every company's context
+            prefetched_docs = {}
+            if UNIFIED_INDEX and slots:
+                try:
+                    with timed("retrieval_unified"):
+                        prefetched_docs = hybrid_search_by_company(
+                            get_unified_vectorstore(VECTORSTORE_ROOT), unified_index_directory(VECTORSTORE_ROOT),
+                            general_query, query_embedding, list(slots), k=RETRIEVAL_FETCH_K
+                        )
+                except Exception as e:
+                    st.error(f"❌ Error searching the unified index: {str(e)}")
+                    invalidate_vectorstore(UNIFIED_INDEX_DIRNAME)
+                    # Company directories only hold manifests in unified mode - there is nothing to fall back to
+                    for _, slot in slots.values():
+                        slot.caption("⚠️ No response - the unified index could not be searched")
+                    slots = {}
 
-                        if response.status_code == 200:
-                            try:
-                                answer = response.json()['candidates'][0]['content']['parts'][0]['text']
-                                st.success(answer)
-                                
-                                # Show source documents with download links
-                                if docs:
-                                    with st.expander("📚 Source Documents"):
-                                        for i, doc in enumerate(docs[:3]):
-                                            st.markdown(f"**Source {i+1}:**")
-                                            st.text(doc.page_content[:500] + "...")
-                                            
-                                            # Add download link if source information is available
-                                            if 'source' in doc.metadata:
-                                                source_file = doc.metadata['source']
-                                                file_path = os.path.join("data/pdfs", company, os.path.basename(source_file))
-                                                if os.path.exists(file_path):
-                                                    with open(file_path, "rb") as f:
-                                                        st.download_button(
-                                                        label=f"Download {os.path.basename(source_file)}",
-                                                        data=f,
-                                                        file_name=os.path.basename(source_file),
-                                                        mime="application/pdf",
-                                                        key=f"download_general_{company}_{i}_{hash(general_query)}"
-                                                    )
-                                            st.markdown("---")
-                                            
-                            except Exception as e:
-                                st.error("❌ Error parsing response from Gemini")
-                        else:
-                            st.error(f"❌ Gemini API Error: {response.status_code}")
-                            
-                    except Exception as e:
-                        error_msg = str(e)
-                        if "no such table: tenants" in error_msg:
-                            st.error("❌ Database error detected. Please use admin access to click 'Relearn PDFs' to rebuild the knowledge base.")
-                            clear_company_vectorstore_cache(company)
-                        else:
-                            st.error(f"❌ Error accessing knowledge base: {error_msg}")
-                            st.info("💡 Try using admin access to click 'Relearn PDFs' to rebuild the knowledge base.")
-                            clear_company_vectorstore_cache(company)
-                else:
-                    st.warning(f"⚠️ Knowledge base not found for {company}.")
-                st.markdown("---")
+            # Retrieval + LLM calls run concurrently; worker threads share this
+            # script's context so they can read session state
+            ctx = get_script_run_ctx()
+            with ThreadPoolExecutor(max_workers=GENERAL_CHAT_CONCURRENCY,
+                                    initializer=add_script_run_ctx, initargs=(None, ctx)) as pool:
+                futures = {
+                    pool.submit(ask_company_general_question, company, general_query, vectorstore_path,
+                                query_embedding, answer_cache,
+                                prefetched_docs.get(company, []) if UNIFIED_INDEX else None): company
+                    for company, (vectorstore_path, _) in slots.items()
+                }
+                for future in as_completed(futures):
+                    company = futures[future]
+                    with slots[company][1].container():
+                        render_general_answer(company, general_query, future.result(),
+                                              query_embedding, answer_cache)
+            metrics.record("general_chat_total", time.perf_counter() - question_start)
 
 elif st.session_state.current_view == "Resources":
     st.markdown("---")
     st.subheader("📚 Resources - All Company PDFs")
     
     company_base_dir = "data/pdfs"
-    company_folders = [f for f in os.listdir(company_base_dir) 
-                      if os.path.isdir(os.path.join(company_base_dir, f))]
+    company_folders = list_companies(company_base_dir)
     
     if not company_folders:
         st.info("👈 No companies found. Please use admin access in the sidebar to add companies first.")
@@ -707,52 +894,47 @@ elif st.session_state.current_view == "Resources":
         # Create tabs or expandable sections for each company
         for company in company_folders:
             with st.expander(f"🏢 {company}", expanded=False):
-                company_pdf_dir = os.path.join(company_base_dir, company)
-                pdf_files = [f for f in os.listdir(company_pdf_dir) if f.endswith(".pdf")]
+                catalog = pdf_catalog(os.path.join(company_base_dir, company))
                 
-                if pdf_files:
-                    st.info(f"Found {len(pdf_files)} PDF(s) for {company}")
+                if catalog["files"]:
+                    st.info(f"Found {catalog['count']} PDF(s) for {company}")
                     
                     # Display company logo if available
-                    logo = get_company_logo(company)
+                    logo = get_company_logo(company, size=80)
                     if logo:
                         col1, col2 = st.columns([1, 4])
                         with col1:
                             st.image(logo, width=80)
                     
+                    # Expander bodies run on every rerun, so PDFs are only read
+                    # for the companies whose downloads were asked for
+                    show_downloads = st.toggle("⬇️ Show download buttons", key=f"resources_downloads_{company}")
+                    
                     # Create columns for better layout
                     cols = st.columns(2)
                     
-                    for i, pdf_file in enumerate(pdf_files):
+                    for i, pdf in enumerate(catalog["files"]):
                         with cols[i % 2]:  # Alternate between columns
-                            pdf_path = os.path.join(company_pdf_dir, pdf_file)
-                            
                             # Create a container for each PDF
                             with st.container():
-                                st.markdown(f"**📄 {pdf_file}**")
+                                st.markdown(f"**📄 {pdf['name']}**")
                                 
-                                # Get file size
-                                try:
-                                    file_size = os.path.getsize(pdf_path)
-                                    size_mb = round(file_size / (1024 * 1024), 2)
-                                    st.caption(f"Size: {size_mb} MB")
-                                except:
-                                    st.caption("Size: Unknown")
+                                size_mb = round(pdf["size"] / (1024 * 1024), 2)
+                                st.caption(f"Size: {size_mb} MB")
                                 
                                 # Download button
-                                try:
-                                    with open(pdf_path, "rb") as f:
-                                        pdf_data = f.read()
+                                if show_downloads:
+                                    try:
                                         st.download_button(
-                                            label=f"⬇️ Download {pdf_file}",
-                                            data=pdf_data,
-                                            file_name=pdf_file,
+                                            label=f"⬇️ Download {pdf['name']}",
+                                            data=pdf_bytes(pdf["path"]),
+                                            file_name=pdf["name"],
                                             mime="application/pdf",
-                                            key=f"download_resources_{company}_{pdf_file}",
+                                            key=f"download_resources_{company}_{pdf['name']}",
                                             use_container_width=True
                                         )
-                                except Exception as e:
-                                    st.error(f"Error loading {pdf_file}: {str(e)}")
+                                    except Exception as e:
+                                        st.error(f"Error loading {pdf['name']}: {str(e)}")
                                 
                                 st.markdown("---")
                 else:
@@ -762,20 +944,9 @@ elif st.session_state.current_view == "Resources":
         st.markdown("---")
         st.subheader("📊 Summary")
         
-        total_pdfs = 0
-        total_size = 0
-        
-        for company in company_folders:
-            company_pdf_dir = os.path.join(company_base_dir, company)
-            pdf_files = [f for f in os.listdir(company_pdf_dir) if f.endswith(".pdf")]
-            total_pdfs += len(pdf_files)
-            
-            for pdf_file in pdf_files:
-                try:
-                    file_size = os.path.getsize(os.path.join(company_pdf_dir, pdf_file))
-                    total_size += file_size
-                except:
-                    pass
+        summary = library_summary([os.path.join(company_base_dir, company) for company in company_folders])
+        total_pdfs = summary["count"]
+        total_size = summary["size"]
         
         col1, col2, col3 = st.columns(3)
         
@@ -809,86 +980,167 @@ elif st.session_state.current_view == "Ask Questions":
             query = st.text_input("🔍 Enter your question:", placeholder="Ask me anything about underwriting...")
             
             if query:
+                question_start = time.perf_counter()
                 with st.spinner("🤖 BIBLIO is analyzing your question..."):
                     try:
-                        # Get company-specific vectorstore
-                        vectorstore = get_company_vectorstore(selected_company, vectorstore_path)
-                        
-                        retriever = vectorstore.as_retriever()
-                        docs = retriever.get_relevant_documents(query)
-                        context = """
+                        # Embed the question once - used for the answer cache and retrieval
+                        with timed("query_embedding", selected_company):
+                            query_embedding = load_embedding_model().embed_query(query)
+                        answer_cache = get_answer_cache()
+                        with timed("answer_cache_lookup", selected_company):
+                            cached = answer_cache.get(selected_company, query_embedding)
 
-""".join([doc.page_content for doc in docs])
+                        if cached:
+                            with timed("render", selected_company):
+                                st.info(f"⚡ Answered from cache ({cached['model']}) - similar question: \"{cached['question']}\"")
+                                st.markdown("---")
+                                st.markdown("### 🤖 BIBLIO Response")
+                                st.markdown(f"**Company:** {selected_company}")
+                                st.markdown(f"**Question:** {query}")
+                                st.markdown("**Answer:**")
+                                st.success(cached["answer"])
+                                render_source_documents(
+                                    cached_source_documents(cached),
+                                    key_prefix=f"download_ask_{selected_company}_{hash(query)}"
+                                )
+                        else:
+                            if UNIFIED_INDEX:
+                                # Shared index, restricted to this company's chunks
+                                with timed("retrieval", selected_company):
+                                    docs = hybrid_search(get_unified_vectorstore(VECTORSTORE_ROOT),
+                                                         unified_index_directory(VECTORSTORE_ROOT),
+                                                         query, query_embedding, k=RETRIEVAL_FETCH_K,
+                                                         company=selected_company)
+                            else:
+                                # Get company-specific vectorstore
+                                store_path = current_store_directory(vectorstore_path)
+                                vectorstore = get_company_vectorstore(selected_company, store_path)
+
+                                with timed("retrieval", selected_company):
+                                    docs = hybrid_search(vectorstore, store_path, query, query_embedding,
+                                                         k=RETRIEVAL_FETCH_K)
+                            with timed("rerank", selected_company):
+                                docs = rerank_documents(query, docs, top_n=RETRIEVAL_K, token_budget=prompt_token_budget())
+                            with timed("prompt_build", selected_company):
+                                context = build_prompt_context(docs)
+                            docs = context["docs"]
 
-                        payload = {
-                            "contents": [{
-                                "parts": [{
-                                    "text": f"""As a professional insurance broker assistant, answer the following question using ONLY the context provided for {selected_company}.
+                            payload = {
+                                "contents": [{
+                                    "parts": [{
+                                        "text": f"""As a professional insurance broker assistant, answer the following question using ONLY the context provided for {selected_company}.
 
 Question: {query}
 
-Context from {selected_company}: {context}
+Context from {selected_company}: {context['text']}
 
 Please provide a clear, professional response that would be helpful for insurance brokers and their clients. Base your answer ONLY on the provided context from {selected_company}.
 """
+                                    }]
                                 }]
-                            }]
-                        }
-
-                        response, used_model = call_gemini_with_fallback(payload)
-                        st.info(f"🤖 Using model: {used_model}")
-
-                        st.markdown("---")
-                        if response.status_code == 429:
-                            st.error("🚫 Rate limit reached. Please wait a moment and try again.")
-                            st.info("💡 Try asking fewer questions or wait 1-2 minutes between requests.")
-                        elif response.status_code == 200:
-                            try:
-                                answer = response.json()['candidates'][0]['content']['parts'][0]['text']
-                                st.markdown("### 🤖 BIBLIO Response")
-                                st.markdown(f"**Company:** {selected_company}")
-                                st.markdown(f"**Question:** {query}")
-                                st.markdown("**Answer:**")
-                                st.success(answer)
-                                
-                                # Show source documents with download links
-                                if docs:
-                                    with st.expander("📚 Source Documents"):
-                                        for i, doc in enumerate(docs[:3]):
-                                            st.markdown(f"**Source {i+1}:**")
-                                            st.text(doc.page_content[:500] + "...")
-                                            
-                                            # Add download link if source information is available
-                                            if 'source' in doc.metadata:
-                                                source_file = doc.metadata['source']
-                                                # Assuming the source metadata contains the full path within the data/pdfs structure
-                                                # You might need to adjust this path based on how your source metadata is stored
-                                                file_path = source_file
-                                                if os.path.exists(file_path):
-                                                     with open(file_path, "rb") as f:
-                                                        st.download_button(
-                                                        label=f"Download {os.path.basename(source_file)}",
-                                                        data=f,
-                                                        file_name=os.path.basename(source_file),
-                                                        mime="application/pdf",
-                                                        key=f"download_ask_{selected_company}_{i}_{hash(query)}"
-                                                    )
-                                            st.markdown("---")
-                                            
-                            except Exception as e:
-                                st.error("❌ Error parsing response from Gemini")
-                        else:
-                            st.error(f"❌ Gemini API Error: {response.status_code}")
+                            }
+
+                            llm_start = time.perf_counter()
+                            with timed("llm", selected_company):
+                                if STREAM_RESPONSES:
+                                    response, used_model = call_gemini_stream_with_fallback(payload)
+                                else:
+                                    response, used_model = call_gemini_with_fallback(payload)
+                            st.info(f"🤖 Using model: {used_model}")
+                            st.caption(describe_context(context))
+
+                            with timed("render", selected_company):
+                                st.markdown("---")
+                                if response.status_code == 429:
+                                    st.error("🚫 Rate limit reached. Please wait a moment and try again.")
+                                    st.info("💡 Try asking fewer questions or wait 1-2 minutes between requests.")
+                                elif response.status_code == 200:
+                                    try:
+                                        st.markdown("### 🤖 BIBLIO Response")
+                                        st.markdown(f"**Company:** {selected_company}")
+                                        st.markdown(f"**Question:** {query}")
+                                        st.markdown("**Answer:**")
+                                        if STREAM_RESPONSES:
+                                            # Render tokens as they arrive
+                                            answer_box = st.empty()
+                                            answer = ""
+                                            for piece in iter_stream_text(response):
+                                                if not answer:
+                                                    metrics.record("llm_first_token", time.perf_counter() - llm_start,
+                                                                   selected_company)
+                                                answer += piece
+                                                answer_box.success(answer + "▌")
+                                            metrics.record("llm_stream", time.perf_counter() - llm_start, selected_company)
+                                            if not answer:
+                                                raise ValueError("Empty response stream")
+                                            answer_box.success(answer)
+                                        else:
+                                            answer = response.json()['candidates'][0]['content']['parts'][0]['text']
+                                            st.success(answer)
+
+                                        answer_cache.put(selected_company, query, query_embedding, answer, used_model, docs[:3])
+
+                                        # Show source documents with download links
+                                        render_source_documents(
+                                            docs, key_prefix=f"download_ask_{selected_company}_{hash(query)}"
+                                        )
+
+                                    except Exception as e:
+                                        st.error("❌ Error parsing response from Gemini")
+                                else:
+                                    st.error(f"❌ Gemini API Error: {response.status_code}")
                             
+                    except StoreCorruptError as e:
+                        render_store_rebuild(selected_company, str(e))
                     except Exception as e:
-                        error_msg = str(e)
-                        if "no such table: tenants" in error_msg:
-                            st.error("❌ Database error detected. Please use admin access to click 'Relearn PDFs' to rebuild the knowledge base.")
-                            clear_company_vectorstore_cache(selected_company)
-                        else:
-                            st.error(f"❌ Error accessing knowledge base: {error_msg}")
-                            st.info("💡 Try using admin access to click 'Relearn PDFs' to rebuild the knowledge base.")
-                            clear_company_vectorstore_cache(selected_company)
+                        st.error(f"❌ Error accessing knowledge base: {str(e)}")
+                        st.info("💡 Try using admin access to click 'Relearn PDFs' to rebuild the knowledge base.")
+                        clear_company_vectorstore_cache(selected_company)
+                    finally:
+                        metrics.record("question_total", time.perf_counter() - question_start, selected_company)
+
+elif st.session_state.current_view == "Metrics":
+    st.markdown("---")
+    st.subheader("📈 Metrics - Stage Latencies")
+
+    if not st.session_state.get("admin_authenticated"):
+        st.info("🔒 Metrics are only available in admin mode.")
+    else:
+        metrics_store = get_metrics_store()
+        windows = {"Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400}
+        window = st.selectbox("Time window:", list(windows))
+        if not metrics.METRICS_ENABLED:
+            st.warning("⚠️ Metrics recording is turned off (METRICS_ENABLED=false).")
+
+        def timing_rows(summary, by_company=False):
+            rows = []
+            for row in summary:
+                entry = {"Stage": row["stage"]}
+                if by_company:
+                    entry["Company"] = row["company"] or "-"
+                entry["Count"] = row["count"]
+                for q, seconds in row["quantiles"].items():
+                    entry[f"p{int(q * 100)} (ms)"] = round(seconds * 1000, 1)
+                rows.append(entry)
+            return rows
+
+        stage_rows = timing_rows(metrics_store.summary(windows[window]))
+        if not stage_rows:
+            st.info("No timings recorded in this window yet.")
+        else:
+            st.markdown("#### ⏱️ By stage")
+            st.dataframe(stage_rows, use_container_width=True, hide_index=True)
+
+            st.markdown("#### 🏢 By stage and company")
+            st.dataframe(timing_rows(metrics_store.summary(windows[window], by_company=True), by_company=True),
+                         use_container_width=True, hide_index=True)
+
+        with st.expander("Prometheus export"):
+            prometheus_text = metrics_store.prometheus_text(windows[window])
+            st.code(prometheus_text, language="text")
+            st.download_button("⬇️ Download", prometheus_text, file_name="metrics.prom", mime="text/plain")
+            if metrics.METRICS_PORT:
+                st.caption(f"Also served at /metrics on port {metrics.METRICS_PORT}")
 
 else:
     # This handles any undefined views
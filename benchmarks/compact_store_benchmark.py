@@ -0,0 +1,134 @@
+"""Recall vs size of the compact int8 store against Chroma.
+
+Loads the vectors of an existing company store (or generates clustered
+synthetic ones), writes them to a fresh Chroma store and to compact stores
+with and without full-precision re-ranking, and reports disk size, recall@k
+against exact float32 search and query latency for each.
+
+    python benchmarks/compact_store_benchmark.py --company "Acme Insurance"
+    python benchmarks/compact_store_benchmark.py --synthetic 50000 --output compact.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+__import__('pysqlite3')
+sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+import chromadb
+from langchain_core.documents import Document
+from compact_store import CompactVectorStore, quantize
+from store_versions import current_store_directory
+
+def directory_size_mb(path):
+    """Allocated size on disk (unwritten parts of sparse files don't count)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.stat(os.path.join(root, name)).st_blocks * 512 for name in files)
+    return total / (1024 * 1024)
+
+def load_store_vectors(store_directory):
+    client = chromadb.PersistentClient(path=store_directory)
+    collection = client.get_collection("langchain")
+    data = collection.get(include=["embeddings", "documents"])
+    return data["ids"], np.asarray(data["embeddings"], dtype=np.float32), data["documents"]
+
+def synthetic_vectors(count, dim=384, clusters=200, seed=0):
+    """Clustered unit vectors - closer to real chunk embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=count)] + rng.normal(scale=0.6, size=(count, dim))
+    ids = [f"chunk-{i:07d}" for i in range(count)]
+    return ids, vectors.astype(np.float32), [f"synthetic chunk {i}" for i in range(count)]
+
+def sample_queries(vectors, count, seed=1):
+    """Stored vectors with noise added, so queries are near but not equal to a chunk."""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(len(vectors), size=count)]
+    queries = picked + rng.normal(scale=0.02, size=picked.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def recall(found, expected):
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)]))
+
+def timed_queries(search, queries):
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+def run(ids, vectors, texts, queries, k, rerank_k, batch_size=1000):
+    normalized, _, _ = quantize(vectors)
+    exact = [[ids[i] for i in np.argsort(-(normalized @ query))[:k]] for query in queries]
+    results = {"chunks": len(ids), "dim": int(vectors.shape[1]), "k": k, "queries": len(queries), "stores": {}}
+    workdir = tempfile.mkdtemp(prefix="compact-bench-")
+    try:
+        # Chroma, as ingestion writes it today
+        chroma_dir = os.path.join(workdir, "chroma")
+        collection = chromadb.PersistentClient(path=chroma_dir).get_or_create_collection("langchain")
+        for start in range(0, len(ids), batch_size):
+            collection.add(ids=ids[start:start + batch_size],
+                           embeddings=normalized[start:start + batch_size].tolist(),
+                           documents=texts[start:start + batch_size])
+        found, latency = timed_queries(
+            lambda query: collection.query(query_embeddings=[query.tolist()], n_results=k)["ids"][0], queries
+        )
+        results["stores"]["chroma"] = {"size_mb": directory_size_mb(chroma_dir),
+                                       "recall": recall(found, exact), "latency_ms": latency}
+
+        for name, full_precision in (("compact_int8_rerank", True), ("compact_int8_only", False)):
+            store_dir = os.path.join(workdir, name)
+            store = CompactVectorStore(store_dir, embedding_function=None, rerank_k=rerank_k,
+                                       full_precision=full_precision)
+            for start in range(0, len(ids), batch_size):
+                store.add_vectors(ids[start:start + batch_size], normalized[start:start + batch_size],
+                                  [Document(page_content=text, metadata={"chunk_id": chunk_id})
+                                   for chunk_id, text in zip(ids[start:start + batch_size],
+                                                             texts[start:start + batch_size])])
+            store.persist()
+            found, latency = timed_queries(
+                lambda query: [doc.metadata["chunk_id"] for doc in store.similarity_search_by_vector(query, k)],
+                queries,
+            )
+            store.close()
+            results["stores"][name] = {"size_mb": directory_size_mb(store_dir),
+                                       "recall": recall(found, exact), "latency_ms": latency}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--company", help="benchmark the vectors of this company's store")
+    source.add_argument("--synthetic", type=int, help="benchmark this many synthetic vectors")
+    parser.add_argument("--vectorstore-root", default="vectorstores")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--rerank-k", type=int, default=50)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.company:
+        ids, vectors, texts = load_store_vectors(current_store_directory(os.path.join(args.vectorstore_root, args.company)))
+    else:
+        ids, vectors, texts = synthetic_vectors(args.synthetic)
+    print(f"📊 Benchmarking {len(ids)} vectors of dimension {vectors.shape[1]}")
+
+    results = run(ids, vectors, texts, sample_queries(vectors, args.queries), args.k, args.rerank_k)
+    print(f"{'store':<22}{'size MB':>10}{'recall@' + str(args.k):>12}{'ms/query':>11}")
+    for name, stats in results["stores"].items():
+        print(f"{name:<22}{stats['size_mb']:>10.1f}{stats['recall']:>12.3f}{stats['latency_ms']:>11.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Local stand-in for the Gemini generateContent API, for benchmarks.
+
+Answers ``/models/<model>:generateContent`` with a canned JSON answer and
+``:streamGenerateContent?alt=sse`` with the same answer as server-sent
+events, after a configurable delay. Point ``GeminiClient(base_url=...)`` or
+GEMINI_API_BASE at it.
+
+    python benchmarks/fake_gemini.py --port 8765 --latency-ms 800
+"""
+import json
+import time
+import argparse
+import threading
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("Based on the provided guidelines, the risk is eligible subject to underwriting review "
+          "of loss runs and the limits shown in the carrier's program.")
+
+class FakeGemini:
+    """Fake Gemini server on a daemon thread; ``base_url`` is what GeminiClient needs."""
+
+    def __init__(self, port=0, latency_ms=0, first_token_ms=None, stream_chunks=8):
+        self.latency_ms = latency_ms
+        # Streams send their first event after this long, the rest spread over the remaining latency
+        self.first_token_ms = latency_ms / 4 if first_token_ms is None else first_token_ms
+        self.stream_chunks = stream_chunks
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1beta"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    fake.requests += 1
+                prompt_tokens = len(json.dumps(payload)) // 4
+                path = urlparse(self.path).path
+                if path.endswith(":streamGenerateContent"):
+                    self._stream(prompt_tokens)
+                elif path.endswith(":generateContent"):
+                    time.sleep(fake.latency_ms / 1000)
+                    self._send_json(fake.response(ANSWER, prompt_tokens))
+                else:
+                    self.send_error(404)
+
+            def _send_json(self, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, prompt_tokens):
+                words = ANSWER.split(" ")
+                step = max(1, -(-len(words) // fake.stream_chunks))
+                pieces = [" ".join(words[i:i + step]) + " " for i in range(0, len(words), step)]
+                gap = max(0.0, fake.latency_ms - fake.first_token_ms) / 1000 / max(1, len(pieces) - 1)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                time.sleep(fake.first_token_ms / 1000)
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(gap)
+                    event = json.dumps(fake.response(piece, prompt_tokens), ensure_ascii=False)
+                    self.wfile.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @staticmethod
+    def response(text, prompt_tokens):
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens,
+                              "totalTokenCount": prompt_tokens + len(text) // 4},
+        }
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-gemini", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.port, args.latency_ms)
+    print(f"🤖 Fake Gemini at {fake.base_url}")
+    fake.server.serve_forever()
+
+if __name__ == "__main__":
+    main()
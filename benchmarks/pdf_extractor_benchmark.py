@@ -0,0 +1,98 @@
+"""Throughput and chunk counts of the PDF extractors on the same files.
+
+Extracts and splits every PDF with each extractor, first file by file in
+this process and then through ingestion's process pool (which splits long
+PDFs into page ranges for the PyMuPDF extractor), and reports pages per
+second, chunk counts and sizes and how many chunks come from tables.
+
+    python benchmarks/pdf_extractor_benchmark.py --company "Acme Insurance"
+    python benchmarks/pdf_extractor_benchmark.py --synthetic 50 --workers 4 --output extractors.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import load_and_split_pdf, iter_processed_pdfs
+from pdf_extractors import EXTRACTORS, PDF_PAGES_PER_TASK
+
+def run_sequential(files, extractor):
+    pages, chunks = 0, []
+    start = time.perf_counter()
+    for file_path in files.values():
+        page_count, file_chunks = load_and_split_pdf(file_path, extractor=extractor)
+        pages += page_count
+        chunks.extend(file_chunks)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "pages": pages,
+        "pages_per_s": pages / seconds if seconds else None,
+        "chunks": len(chunks),
+        "mean_chunk_chars": sum(len(chunk.page_content) for chunk in chunks) / len(chunks) if chunks else 0,
+        "table_chunks": sum(1 for chunk in chunks if chunk.metadata.get("table")),
+    }
+
+def run_parallel(files, extractor, workers):
+    pages, errors = 0, 0
+    start = time.perf_counter()
+    for _, page_count, _, error, _ in iter_processed_pdfs(files, workers, extractor=extractor):
+        pages += page_count
+        errors += error is not None
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "pages": pages, "pages_per_s": pages / seconds if seconds else None,
+            "errors": errors}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--company", help="benchmark this company's PDFs")
+    source.add_argument("--pdf-dir", help="benchmark the PDFs in this directory")
+    source.add_argument("--synthetic", type=int, help="benchmark this many synthetic PDFs")
+    parser.add_argument("--pages", type=int, default=40, help="pages per synthetic PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--extractors", nargs="+", default=list(EXTRACTORS), choices=EXTRACTORS)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = None
+    if args.synthetic:
+        from synthetic_corpus import generate_corpus
+        workdir = tempfile.mkdtemp(prefix="extractor-bench-")
+        generate_corpus(workdir, args.synthetic, args.pages)
+        pdf_dir = workdir
+    else:
+        pdf_dir = args.pdf_dir or os.path.join("data/pdfs", args.company)
+
+    try:
+        files = {name: os.path.join(pdf_dir, name) for name in sorted(os.listdir(pdf_dir)) if name.endswith(".pdf")}
+        print(f"📄 Benchmarking {len(files)} PDFs from {pdf_dir}")
+        results = {"files": len(files), "workers": args.workers, "pages_per_task": PDF_PAGES_PER_TASK,
+                   "extractors": {}}
+        for extractor in args.extractors:
+            results["extractors"][extractor] = {
+                "sequential": run_sequential(files, extractor),
+                "parallel": run_parallel(files, extractor, args.workers),
+            }
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'extractor':<10}{'pages':>8}{'pages/s':>10}{'parallel':>10}{'chunks':>9}{'chars':>8}{'tables':>8}")
+    for extractor, stats in results["extractors"].items():
+        sequential, parallel = stats["sequential"], stats["parallel"]
+        print(f"{extractor:<10}{sequential['pages']:>8}{sequential['pages_per_s'] or 0:>10.1f}"
+              f"{parallel['pages_per_s'] or 0:>10.1f}{sequential['chunks']:>9}"
+              f"{sequential['mean_chunk_chars']:>8.0f}{sequential['table_chunks']:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
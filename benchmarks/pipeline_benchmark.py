@@ -0,0 +1,303 @@
+"""Ingestion and retrieval benchmark on synthetic carrier PDF corpora.
+
+For each corpus size a deterministic set of synthetic PDFs is generated and
+ingested into a fresh store in a child process, which reports throughput
+(pages, chunks and embeddings per second), peak RSS and the store's size on
+disk. A second child process then measures cold and warm store opens and the
+latency of each question stage - embedding, hybrid retrieval, rerank and
+prompt building, and the full question path against a local fake Gemini
+server, so no real LLM is called. Results are written as JSON together with
+the commit and the retrieval settings, so runs are comparable across commits.
+
+    python benchmarks/pipeline_benchmark.py --sizes 10 100 1000 --output pipeline.json
+    VECTOR_STORAGE=compact python benchmarks/pipeline_benchmark.py --sizes 100
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from synthetic_corpus import generate_corpus, sample_questions
+from fake_gemini import FakeGemini
+
+COMPANY = "bench_carrier"
+# A single fake model with budgets no benchmark run can exhaust
+BENCH_MODELS = [("bench-model", 10 ** 6, 10 ** 9, 10 ** 9, 4000)]
+
+def directory_size_mb(path):
+    """Allocated size on disk (unwritten parts of sparse files don't count)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.stat(os.path.join(root, name)).st_blocks * 512 for name in files)
+    return total / (1024 * 1024)
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+def latency_stats(seconds):
+    values = np.asarray(seconds) * 1000
+    return {"count": len(values), "p50_ms": float(np.percentile(values, 50)),
+            "p99_ms": float(np.percentile(values, 99)), "mean_ms": float(values.mean())}
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=REPO_ROOT).returncode != 0
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+def store_directory(persist_directory):
+    from unified_index import UNIFIED_INDEX, unified_index_directory
+    from store_versions import current_store_directory
+    if UNIFIED_INDEX:
+        return unified_index_directory(os.path.dirname(persist_directory))
+    return current_store_directory(persist_directory)
+
+def settings():
+    """The knobs that change what is being measured."""
+    import ingest
+    from retrieval import HYBRID_RETRIEVAL, HYBRID_FETCH_K
+    from reranker import RERANK_ENABLED
+    from compact_store import VECTOR_STORAGE
+    from unified_index import UNIFIED_INDEX
+    from chunk_dedup import DEDUP_ENABLED
+    from embedding_backends import EMBEDDING_BACKEND, embedding_signature
+    from pdf_extractors import extractor_signature
+    from chunking import chunker_signature
+    return {
+        "pdf_extractor": extractor_signature(),
+        "chunker": chunker_signature(),
+        "vector_storage": VECTOR_STORAGE,
+        "unified_index": UNIFIED_INDEX,
+        "embedding": embedding_signature(),
+        "embedding_backend": EMBEDDING_BACKEND,
+        "hybrid_retrieval": HYBRID_RETRIEVAL,
+        "hybrid_fetch_k": HYBRID_FETCH_K,
+        "rerank": RERANK_ENABLED,
+        "dedup": DEDUP_ENABLED,
+        "ingest_workers": ingest.INGEST_WORKERS,
+        "embed_batch_size": ingest.EMBED_BATCH_SIZE,
+    }
+
+def ingest_phase(args):
+    """Child process: ingest the corpus in the current directory."""
+    import ingest
+    import metrics
+
+    persist_directory = os.path.join("vectorstores", COMPANY)
+    start = time.perf_counter()
+    ingest.ingest_company_pdfs(COMPANY, persist_directory, full_rebuild=True,
+                               max_workers=args.workers, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    # The manifest is kept with the company's store, or beside the unified one
+    manifest = ingest.load_manifest(persist_directory if ingest.UNIFIED_INDEX else store_directory(persist_directory))
+    chunks = sum(len(entry["chunk_ids"]) for entry in manifest["files"].values())
+    stages = {row["stage"]: row["sum"] for row in metrics.get_store().summary()}
+    embed_seconds = stages.get("embed_model")
+    pages = args.documents * args.pages
+    return {
+        "documents": args.documents,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "pages_per_s": pages / elapsed,
+        "chunks_per_s": chunks / elapsed,
+        "embeddings_per_s": chunks / embed_seconds if embed_seconds else None,
+        "stage_seconds": stages,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "store_size_mb": directory_size_mb(store_directory(persist_directory)),
+        "embedding_cache_mb": sum(os.stat(os.path.join("vectorstores", name)).st_blocks * 512
+                                  for name in os.listdir("vectorstores")
+                                  if name.startswith("embedding_cache.sqlite3")) / (1024 * 1024),
+    }
+
+def query_phase(args):
+    """Child process: time store opens and the question path against the ingested store."""
+    import ingest
+    from compact_store import VECTOR_STORAGE
+    from unified_index import UNIFIED_INDEX
+    from retrieval import hybrid_search
+    from reranker import RERANK_ENABLED, RERANK_FETCH_K, rerank_documents
+    from context_builder import build_context
+    from llm_client import GeminiClient, context_token_budget, iter_stream_text
+
+    persist_directory = os.path.join("vectorstores", COMPANY)
+    directory = store_directory(persist_directory)
+    company = COMPANY if UNIFIED_INDEX else None
+    questions = sample_questions(args.queries, args.seed)
+    # Over-fetch for the reranker, as the app does
+    fetch_k = max(args.k, RERANK_FETCH_K) if RERANK_ENABLED else args.k
+
+    # Load the model first so the open timings only cover the store
+    embeddings = ingest.load_embedding_model()
+    embeddings.embed_query("warm up")
+
+    def open_and_query():
+        start = time.perf_counter()
+        vectordb = ingest.open_vector_store(directory, embeddings)
+        opened = time.perf_counter()
+        vectordb.similarity_search("minimum premium", k=args.k)
+        return vectordb, {"open_ms": (opened - start) * 1000,
+                          "first_query_ms": (time.perf_counter() - opened) * 1000}
+
+    vectordb, cold = open_and_query()
+    if VECTOR_STORAGE == "compact":
+        vectordb.close()
+    # Reopened in the same process, as after an ingest invalidates the registry
+    vectordb, warm = open_and_query()
+
+    fake = FakeGemini(latency_ms=args.llm_latency_ms).start()
+    client = GeminiClient("benchmark", models=BENCH_MODELS, base_url=fake.base_url)
+    budget = context_token_budget(client.likely_model(), BENCH_MODELS)
+    timings = {name: [] for name in ("query_embedding", "retrieval", "rerank_and_prompt", "llm", "question")}
+    try:
+        for question in questions:
+            question_start = time.perf_counter()
+            query_embedding = embeddings.embed_query(question)
+            embedded = time.perf_counter()
+            docs = hybrid_search(vectordb, directory, question, query_embedding, k=fetch_k, company=company)
+            retrieved = time.perf_counter()
+            context = build_context(rerank_documents(question, docs, top_n=args.k, token_budget=budget), budget)
+            prompted = time.perf_counter()
+            payload = {"contents": [{"parts": [{"text": f"Question: {question}\n\nContext: {context['text']}"}]}]}
+            if args.stream:
+                response, _ = client.generate_stream(payload)
+                answer = "".join(iter_stream_text(response))
+            else:
+                response, _ = client.generate(payload)
+                answer = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+            if not answer:
+                raise RuntimeError("Fake Gemini returned an empty answer")
+            done = time.perf_counter()
+
+            timings["query_embedding"].append(embedded - question_start)
+            timings["retrieval"].append(retrieved - embedded)
+            timings["rerank_and_prompt"].append(prompted - retrieved)
+            timings["llm"].append(done - prompted)
+            timings["question"].append(done - question_start)
+    finally:
+        fake.stop()
+
+    return {
+        "cold_open": cold,
+        "warm_open": warm,
+        "latency": {name: latency_stats(values) for name, values in timings.items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "settings": settings(),
+    }
+
+def run_phase(phase, workdir, args):
+    """Run one phase in a fresh process inside ``workdir`` and return its results."""
+    result_path = os.path.join(workdir, f"{phase}_result.json")
+    command = [sys.executable, os.path.abspath(__file__), "--phase", phase, "--result", result_path,
+               "--documents", str(args.documents), "--pages", str(args.pages), "--queries", str(args.queries),
+               "-k", str(args.k), "--seed", str(args.seed), "--llm-latency-ms", str(args.llm_latency_ms)]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    if args.batch_size:
+        command += ["--batch-size", str(args.batch_size)]
+    if args.stream:
+        command.append("--stream")
+    log_path = os.path.join(workdir, f"{phase}.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        completed = subprocess.run(command, cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{phase} phase failed for {args.documents} documents - see {log_path}")
+    with open(result_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def print_summary(runs):
+    print(f"{'docs':>6}{'pages/s':>10}{'chunks/s':>10}{'emb/s':>9}{'RSS MB':>9}{'store MB':>10}"
+          f"{'cold ms':>9}{'warm ms':>9}{'ret p50':>9}{'ret p99':>9}")
+    for run in runs:
+        ingest, query = run["ingest"], run["query"]
+        retrieval = query["latency"]["retrieval"]
+        print(f"{ingest['documents']:>6}{ingest['pages_per_s']:>10.1f}{ingest['chunks_per_s']:>10.1f}"
+              f"{ingest['embeddings_per_s'] or 0:>9.1f}{ingest['peak_rss_mb']:>9.0f}{ingest['store_size_mb']:>10.1f}"
+              f"{query['cold_open']['open_ms'] + query['cold_open']['first_query_ms']:>9.1f}"
+              f"{query['warm_open']['open_ms'] + query['warm_open']['first_query_ms']:>9.1f}"
+              f"{retrieval['p50_ms']:>9.2f}{retrieval['p99_ms']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="documents per corpus")
+    parser.add_argument("--pages", type=int, default=8, help="pages per document")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="parse processes (default INGEST_WORKERS)")
+    parser.add_argument("--batch-size", type=int, help="embedding batch size (default EMBED_BATCH_SIZE)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="delay of the fake Gemini server")
+    parser.add_argument("--stream", action="store_true", help="use streamGenerateContent")
+    parser.add_argument("--workdir", help="keep corpora and stores here (default: a temporary directory)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--phase", choices=["ingest", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--documents", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        result = ingest_phase(args) if args.phase == "ingest" else query_phase(args)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        return
+
+    root = args.workdir or tempfile.mkdtemp(prefix="pipeline-bench-")
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "pages_per_document": args.pages,
+        "queries": args.queries,
+        "k": args.k,
+        "seed": args.seed,
+        "llm_latency_ms": args.llm_latency_ms,
+        "stream": args.stream,
+        "runs": [],
+    }
+    finished = False
+    try:
+        for documents in args.sizes:
+            workdir = os.path.join(root, f"corpus_{documents}")
+            # Stores are rebuilt on every run, corpora are reused when --workdir is given
+            shutil.rmtree(os.path.join(workdir, "vectorstores"), ignore_errors=True)
+            print(f"📄 Generating {documents} synthetic PDFs...")
+            generate_corpus(os.path.join(workdir, "data", "pdfs", COMPANY), documents, args.pages, args.seed)
+
+            args.documents = documents
+            print(f"🧠 Ingesting {documents} PDFs...")
+            ingest = run_phase("ingest", workdir, args)
+            print(f"🔍 Timing {args.queries} questions...")
+            query = run_phase("query", workdir, args)
+            results["settings"] = query.pop("settings")
+            results["runs"].append({"ingest": ingest, "query": query})
+        finished = True
+    finally:
+        if not args.workdir and finished:
+            shutil.rmtree(root, ignore_errors=True)
+        elif not args.workdir:
+            print(f"⚠️ Kept {root} for inspection")
+
+    print_summary(results["runs"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Deterministic synthetic carrier PDFs for benchmarks.
+
+Each document reads like a carrier underwriting guide: a title page, then
+sections of eligibility rules, limits and rate tables spread over several
+pages. The same seed always produces the same text, so runs are comparable
+across commits.
+
+    python benchmarks/synthetic_corpus.py data/pdfs/bench_carrier --documents 100
+"""
+import os
+import random
+import argparse
+import fitz  # PyMuPDF
+
+CLASSES = [
+    "restaurants", "contractors", "habitational", "auto dealers", "warehouses", "medical offices",
+    "manufacturers", "retail stores", "hotels", "landscapers", "trucking", "schools", "churches",
+    "day care centers", "fitness centers", "wineries", "breweries", "self storage", "car washes",
+]
+COVERAGES = [
+    "general liability", "commercial property", "workers compensation", "commercial auto",
+    "umbrella", "inland marine", "professional liability", "cyber liability", "liquor liability",
+    "builders risk", "employment practices liability", "product recall",
+]
+STATES = [
+    "Arizona", "California", "Colorado", "Florida", "Georgia", "Illinois", "Nevada", "New Jersey",
+    "New York", "North Carolina", "Ohio", "Oregon", "Pennsylvania", "Texas", "Utah", "Washington",
+]
+TERMS = [
+    "loss runs", "prior carrier", "sprinkler systems", "roof age", "protection class", "experience mod",
+    "subcontractor agreements", "hired and non-owned auto", "deductible options", "additional insureds",
+    "waiver of subrogation", "minimum premium", "schedule rating", "fleet size", "driver MVRs",
+]
+SENTENCES = [
+    "Risks in {state} with {term} older than {years} years are referred to underwriting.",
+    "{coverage} for {cls} is written on an occurrence basis with limits up to ${limit:,}.",
+    "Submissions must include {term} for the last {years} years and a completed supplemental application.",
+    "We do not write {cls} with more than {count} claims in the last {years} years.",
+    "The maximum {coverage} limit for {cls} in {state} is ${limit:,} per occurrence.",
+    "Deductibles start at ${deductible:,}; higher deductibles are available for {cls} with favourable {term}.",
+    "{cls} operations in {state} require {term} reviewed by a senior underwriter.",
+    "Schedule rating credits of up to {credit}% apply when {term} meet our guidelines.",
+    "Minimum premium for {coverage} is ${premium:,} and is fully earned at inception.",
+    "New ventures in {cls} are eligible only with {years} years of prior industry experience.",
+]
+
+def _sentence(rng):
+    sentence = rng.choice(SENTENCES).format(
+        state=rng.choice(STATES), term=rng.choice(TERMS), coverage=rng.choice(COVERAGES),
+        cls=rng.choice(CLASSES), years=rng.randint(2, 10), count=rng.randint(1, 5),
+        limit=rng.choice([500000, 1000000, 2000000, 5000000, 10000000]),
+        deductible=rng.choice([500, 1000, 2500, 5000, 10000]), credit=rng.choice([5, 10, 15, 25]),
+        premium=rng.choice([750, 1000, 1500, 2500, 5000]),
+    )
+    return sentence[0].upper() + sentence[1:]
+
+def _rate_table(rng, rows=8):
+    lines = [f"{'Class':<24}{'State':<16}{'Rate':>8}{'Min premium':>14}"]
+    for _ in range(rows):
+        lines.append(f"{rng.choice(CLASSES):<24}{rng.choice(STATES):<16}"
+                     f"{rng.uniform(0.5, 12):>8.2f}{rng.choice([750, 1000, 2500, 5000]):>14,}")
+    return "\n".join(lines)
+
+def document_pages(index, pages, seed=0):
+    """Text of each page of synthetic document ``index``."""
+    rng = random.Random(seed * 1000003 + index)
+    coverage = rng.choice(COVERAGES)
+    texts = [f"Underwriting Guidelines - {coverage.title()}\nProgram {index:05d}\n\n"
+             + " ".join(_sentence(rng) for _ in range(6))]
+    for page in range(1, pages):
+        sections = []
+        for section in range(rng.randint(2, 3)):
+            heading = f"{page}.{section + 1} {rng.choice(CLASSES).title()} - {rng.choice(TERMS).title()}"
+            paragraphs = [" ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+                          for _ in range(rng.randint(1, 3))]
+            sections.append(heading + "\n" + "\n\n".join(paragraphs))
+        if rng.random() < 0.3:
+            sections.append("Rate table\n" + _rate_table(rng))
+        texts.append("\n\n".join(sections))
+    return texts
+
+def write_pdf(path, page_texts):
+    pdf = fitz.open()
+    for text in page_texts:
+        page = pdf.new_page()
+        # insert_textbox writes nothing when the text overflows, so shrink until it fits
+        for fontsize in (9, 8, 7, 6, 5):
+            if page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=fontsize, fontname="helv") >= 0:
+                break
+    pdf.save(path, garbage=3, deflate=True)
+    pdf.close()
+
+def generate_corpus(pdf_folder, documents, pages_per_document=8, seed=0):
+    """Write ``documents`` PDFs into ``pdf_folder`` (existing ones are reused). Returns the page count."""
+    os.makedirs(pdf_folder, exist_ok=True)
+    for index in range(documents):
+        path = os.path.join(pdf_folder, f"guide_{index:05d}.pdf")
+        if not os.path.exists(path):
+            write_pdf(path, document_pages(index, pages_per_document, seed))
+    return documents * pages_per_document
+
+def sample_questions(count, seed=0):
+    """Broker-style questions over the corpus vocabulary."""
+    rng = random.Random(seed + 7919)
+    templates = [
+        "What is the maximum {coverage} limit for {cls} in {state}?",
+        "Do you write {cls} with {term} issues?",
+        "What deductible options are available for {coverage}?",
+        "What is the minimum premium for {cls}?",
+        "Which {term} are required for {cls} in {state}?",
+    ]
+    return [rng.choice(templates).format(coverage=rng.choice(COVERAGES), cls=rng.choice(CLASSES),
+                                         state=rng.choice(STATES), term=rng.choice(TERMS))
+            for _ in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("pdf_folder")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=8, help="pages per document")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = generate_corpus(args.pdf_folder, args.documents, args.pages, args.seed)
+    print(f"📄 {args.documents} documents ({pages} pages) in {args.pdf_folder}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import re
+import hashlib
+import numpy as np
+
+# Drop exact and near-duplicate chunks before they are embedded
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() not in ("0", "false", "no")
+# Maximum SimHash Hamming distance (out of 64 bits) for two chunks to count as near-duplicates
+DEDUP_MAX_HAMMING = int(os.getenv("DEDUP_MAX_HAMMING", 3))
+# Chunks shorter than this (normalised characters) only get exact matching - SimHash is noisy on short text
+DEDUP_MIN_NEAR_CHARS = 200
+
+_WORD_RE = re.compile(r"\w+")
+
+def normalize_text(text):
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+def exact_hash(normalized):
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+def simhash(normalized, shingle_size=3):
+    """64-bit SimHash over word shingles."""
+    words = normalized.split()
+    if len(words) < shingle_size:
+        shingles = [normalized]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles],
+        dtype=">u8",
+    )
+    # One row of 64 bits per shingle; a bit is set in the fingerprint if most shingles set it
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, 64)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+class ChunkDeduplicator:
+    """Finds exact and near-duplicate chunks across a company's corpus.
+
+    Exact duplicates are matched on a hash of the normalised text. Near
+    duplicates are chunks whose SimHash differs in at most ``max_distance``
+    bits; candidates are found through banded lookup tables (the fingerprint
+    is cut into ``max_distance + 1`` bands, and any two fingerprints within
+    that distance must agree on at least one band).
+    """
+
+    def __init__(self, max_distance=None):
+        self.max_distance = DEDUP_MAX_HAMMING if max_distance is None else max_distance
+        self.bands = self.max_distance + 1
+        self.band_bits = 64 // self.bands
+        self.exact = {}                          # exact hash -> owner
+        self.tables = [{} for _ in range(self.bands)]  # band value -> [(simhash, owner)]
+        self.stats = {"seen": 0, "exact": 0, "near": 0}
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.bands)]
+
+    def add(self, fingerprint, owner):
+        """Register a kept chunk. ``fingerprint`` is a ``fingerprint()`` string."""
+        exact, near = fingerprint.split(":")
+        self.exact.setdefault(exact, owner)
+        if near:
+            value = int(near, 16)
+            for table, key in zip(self.tables, self._band_keys(value)):
+                table.setdefault(key, []).append((value, owner))
+
+    def fingerprint(self, text):
+        normalized = normalize_text(text)
+        near = f"{simhash(normalized):016x}" if len(normalized) >= DEDUP_MIN_NEAR_CHARS else ""
+        return f"{exact_hash(normalized)}:{near}"
+
+    def find_duplicate(self, fingerprint):
+        """Return (kind, owner) of an already registered duplicate, or None."""
+        exact, near = fingerprint.split(":")
+        if exact in self.exact:
+            return "exact", self.exact[exact]
+        if near:
+            value = int(near, 16)
+            for table, key in zip(self.tables, self._band_keys(value)):
+                for other, owner in table.get(key, ()):
+                    if bin(value ^ other).count("1") <= self.max_distance:
+                        return "near", owner
+        return None
+
+    def check(self, text, owner):
+        """Fingerprint a chunk and register it unless it duplicates one already seen.
+
+        Returns (fingerprint, duplicate) where ``duplicate`` is the result of
+        ``find_duplicate`` - None means the chunk is kept.
+        """
+        self.stats["seen"] += 1
+        fingerprint = self.fingerprint(text)
+        duplicate = self.find_duplicate(fingerprint)
+        if duplicate is None:
+            self.add(fingerprint, owner)
+        else:
+            self.stats[duplicate[0]] += 1
+        return fingerprint, duplicate
+
+    def summary(self):
+        dropped = self.stats["exact"] + self.stats["near"]
+        share = 100.0 * dropped / self.stats["seen"] if self.stats["seen"] else 0.0
+        return (f"🧹 Dedup: dropped {self.stats['exact']} exact and {self.stats['near']} near-duplicate "
+                f"chunks out of {self.stats['seen']} ({share:.1f}%)")
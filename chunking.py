@@ -0,0 +1,230 @@
+import os
+import re
+import hashlib
+from langchain_core.documents import Document
+
+# "sections" (headings, numbered clauses and page breaks) or "recursive" (fixed 1000/200 character windows)
+CHUNKER = os.getenv("CHUNKER", "sections").lower()
+# Longest section chunk; longer sections are split between clauses, then sentences
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", 1000))
+# Neighbouring chunks of the same section on a page shorter than this are merged
+CHUNK_MIN_CHARS = int(os.getenv("CHUNK_MIN_CHARS", 200))
+# Bumped when the section chunker's output changes, so stores are re-chunked
+SECTION_CHUNKER_VERSION = 2
+
+RECURSIVE_CHUNK_SIZE = 1000
+RECURSIVE_CHUNK_OVERLAP = 200
+
+SECTION_SEPARATOR = " > "
+# Longest line that can be a heading
+MAX_HEADING_CHARS = 90
+
+# "2", "2.1", "2.1.3" followed by a title
+_NUMBERED_HEADING_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,3})\.?\s+([A-Z][^.]*)$")
+_KEYWORD_HEADING_RE = re.compile(r"^(section|article|part|chapter|schedule|appendix|exhibit|endorsement)\s+[\w.-]+",
+                                 re.IGNORECASE)
+# Start of a numbered or lettered clause or bullet: "1.", "2.3.1", "(a)", "iv)", "•"
+_CLAUSE_RE = re.compile(r"^(\(?[a-z0-9]{1,4}[.)]|\d+(?:\.\d+)+|[•▪●◦*-])\s+", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+def chunker_signature(chunker=None):
+    """What a file's chunks were split with, recorded per file in the manifest."""
+    chunker = chunker or CHUNKER
+    if chunker == "sections":
+        return f"sections-v{SECTION_CHUNKER_VERSION}:{CHUNK_MAX_CHARS}:{CHUNK_MIN_CHARS}"
+    return f"recursive:{RECURSIVE_CHUNK_SIZE}:{RECURSIVE_CHUNK_OVERLAP}"
+
+def split_pages(pages, chunker=None):
+    """Split a file's page Documents, in page order, into chunks."""
+    chunker = chunker or CHUNKER
+    if chunker == "sections":
+        return split_sections(pages)
+    if chunker != "recursive":
+        raise ValueError(f"Unknown CHUNKER: {chunker}")
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=RECURSIVE_CHUNK_SIZE,
+        chunk_overlap=RECURSIVE_CHUNK_OVERLAP,
+        length_function=len
+    )
+    return splitter.split_documents(pages)
+
+def heading_level(line):
+    """Outline level of a heading line (1 = top), or None if the line is body text."""
+    if len(line) > MAX_HEADING_CHARS or line.startswith("|"):
+        return None
+    match = _NUMBERED_HEADING_RE.match(line)
+    if match and not line.endswith((",", ";")):
+        return match.group(1).count(".") + 1
+    if _KEYWORD_HEADING_RE.match(line) and not line.endswith("."):
+        return 1
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 4 and all(c.isupper() for c in letters) and not line.endswith("."):
+        return 1
+    return None
+
+def page_units(text):
+    """Split page text into headings and body units (paragraphs and clauses).
+
+    Yields (heading level or None, text). A body unit ends at a blank line,
+    a heading or the start of the next clause.
+    """
+    unit = []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            if unit:
+                yield None, " ".join(unit)
+                unit = []
+            continue
+        level = heading_level(line)
+        if level is not None or (unit and _CLAUSE_RE.match(line)):
+            if unit:
+                yield None, " ".join(unit)
+                unit = []
+            if level is not None:
+                yield level, line
+                continue
+        unit.append(line)
+    if unit:
+        yield None, " ".join(unit)
+
+def _split_long(text, max_chars):
+    """Pieces of at most ``max_chars``, split between sentences, then words."""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def _pack(units, max_chars, reserve=0):
+    """Join units into chunks of at most ``max_chars``; a unit is only cut when it alone is too long.
+
+    The first chunk is kept ``reserve`` characters shorter, to leave room for a prefix.
+    """
+    chunks, current = [], ""
+    for unit in units:
+        limit = max_chars - (0 if chunks else reserve)
+        for piece in _split_long(unit, limit) if len(unit) > limit else [unit]:
+            limit = max_chars - (0 if chunks else reserve)
+            if current and len(current) + 1 + len(piece) > limit:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _merge_small(pieces, min_chars, max_chars):
+    """Merge neighbouring short (path, text, metadata) pieces of the same section and kind."""
+    merged = []
+    for path, text, metadata in pieces:
+        if merged:
+            last_path, last_text, last_metadata = merged[-1]
+            if (last_path == path and len(last_text) < min_chars and len(text) < min_chars
+                    and len(last_text) + 1 + len(text) <= max_chars
+                    and last_metadata.get("table") == metadata.get("table")):
+                merged[-1] = (path, f"{last_text}\n{text}", last_metadata)
+                continue
+        merged.append((path, text, metadata))
+    return merged
+
+def page_hash(context, texts):
+    """Fingerprint of a page: its text, the section it starts in and the chunker settings."""
+    digest = hashlib.sha1(chunker_signature("sections").encode("utf-8"))
+    digest.update(SECTION_SEPARATOR.join(context).encode("utf-8"))
+    for text in texts:
+        digest.update(b"\0" + text.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def split_sections(pages, max_chars=None, min_chars=None):
+    """Chunk page Documents along headings, numbered clauses and page breaks.
+
+    A chunk never spans two sections or two pages, and chunks don't overlap.
+    Each chunk gets a ``section`` path ("2 Eligibility > 2.1 Contractors")
+    and a ``page_hash`` of the page it came from; the same page text under the
+    same section always gives the same chunks, which lets ingestion skip
+    re-embedding unchanged pages of a revised PDF. Table Documents (from the
+    PyMuPDF extractor) are chunked on their own, by rows.
+    """
+    max_chars = max_chars or CHUNK_MAX_CHARS
+    min_chars = CHUNK_MIN_CHARS if min_chars is None else min_chars
+    chunks = []
+    stack = []  # [(level, heading)]
+
+    page_docs = []
+    for doc in pages:
+        if page_docs and doc.metadata.get("page") != page_docs[0].metadata.get("page"):
+            stack = _split_page(page_docs, stack, chunks, max_chars, min_chars)
+            page_docs = []
+        page_docs.append(doc)
+    if page_docs:
+        _split_page(page_docs, stack, chunks, max_chars, min_chars)
+    return chunks
+
+def _split_page(page_docs, stack, chunks, max_chars, min_chars):
+    """Append the chunks of one page to ``chunks``; returns the section stack at the end of the page."""
+    context = [heading for _, heading in stack]
+    hash_ = page_hash(context, [doc.page_content for doc in page_docs])
+    stack = list(stack)
+
+    pieces = []  # (section path, text, metadata)
+    for doc in page_docs:
+        if doc.metadata.get("table"):
+            rows = [row for row in doc.page_content.splitlines() if row.strip()]
+            # Repeat the header row (and Markdown separator) in every piece of a long table
+            header = rows[:2] if len(rows) > 2 and set(rows[1]) <= set("|-: ") else rows[:1]
+            body_chars = max(max_chars - sum(len(row) + 1 for row in header), max_chars // 2)
+            for text in _pack(rows[len(header):], body_chars) or [""]:
+                pieces.append(([h for _, h in stack], "\n".join(header + ([text] if text else [])), doc.metadata))
+            continue
+
+        units, pending_headings = [], []
+
+        def flush():
+            path = [h for _, h in stack]
+            # A heading goes at the top of the first chunk of its body, never on its own
+            heading = "\n".join(pending_headings)
+            reserve = min(len(heading) + 1, max_chars // 2) if heading else 0
+            texts = _pack(units, max_chars, reserve)
+            if heading:
+                texts = [f"{heading}\n{texts[0]}" if texts else heading] + texts[1:]
+            for text in texts:
+                pieces.append((path, text, doc.metadata))
+            units.clear()
+            pending_headings.clear()
+
+        for level, text in page_units(doc.page_content):
+            if level is None:
+                units.append(text)
+                continue
+            if units:
+                flush()
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, text))
+            # A heading stays with the body that follows it
+            pending_headings.append(text)
+        if units or pending_headings:
+            flush()
+
+    for path, text, metadata in _merge_small(pieces, min_chars, max_chars):
+        chunk_metadata = {key: value for key, value in metadata.items() if key != "page_hash"}
+        chunk_metadata["section"] = SECTION_SEPARATOR.join(path)
+        chunk_metadata["page_hash"] = hash_
+        chunks.append(Document(page_content=text, metadata=chunk_metadata))
+    return stack
@@ -0,0 +1,267 @@
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.documents import Document
+
+# "chroma" (default) or "compact": int8 vectors in a memory-mapped file instead of Chroma
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "chroma").lower()
+# Candidates from the int8 scan that are re-scored with the full-precision vectors
+COMPACT_RERANK_K = int(os.getenv("COMPACT_RERANK_K", 50))
+# Keep a float32 copy of every vector for re-ranking (set false for int8 only, 4x smaller vectors)
+COMPACT_FULL_PRECISION = os.getenv("COMPACT_FULL_PRECISION", "true").lower() not in ("0", "false", "no")
+
+COMPACT_DB_FILENAME = "compact_store.sqlite3"
+COMPACT_CODES_FILENAME = "compact_vectors.i8"
+COMPACT_FULL_FILENAME = "compact_vectors.f32"
+
+# Rows scanned per block, bounds the float32 temporaries of a search
+_SCAN_BLOCK_ROWS = 65536
+
+def quantize(vectors):
+    """Symmetric per-vector int8 quantization of L2-normalised vectors.
+
+    Returns (normalised float32 vectors, int8 codes, float32 scales) where
+    ``vector ~= codes * scale``.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return vectors, codes, scales.astype(np.float32)
+
+class CompactVectorStore:
+    """Chunk store with int8-quantized vectors in a memory-mapped file.
+
+    Search scans the int8 codes block by block and re-scores the best
+    ``rerank_k`` candidates with the float32 vectors, which stay on disk and
+    are only paged in for those rows. Chunk text, metadata and each vector's
+    row and scale live in SQLite. Implements the part of the langchain Chroma
+    interface that ingestion and retrieval use.
+    """
+
+    def __init__(self, persist_directory, embedding_function, rerank_k=None, full_precision=None):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.rerank_k = COMPACT_RERANK_K if rerank_k is None else rerank_k
+        full_precision = COMPACT_FULL_PRECISION if full_precision is None else full_precision
+        self._lock = threading.Lock()
+
+        os.makedirs(persist_directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(persist_directory, COMPACT_DB_FILENAME),
+                                     check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                company TEXT,
+                scale REAL NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_company ON chunks (company);
+            CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY);
+            """
+        )
+        self._conn.commit()
+        dim = self._conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+        self.dim = int(dim[0]) if dim else None
+        # Fixed when the store is created, the vector files must stay in step
+        self._conn.execute("INSERT OR IGNORE INTO info (key, value) VALUES ('full_precision', ?)",
+                           ("1" if full_precision else "0",))
+        self._conn.commit()
+        self.full_precision = self._conn.execute(
+            "SELECT value FROM info WHERE key = 'full_precision'"
+        ).fetchone()[0] == "1"
+        self._codes = self._full = None
+        self._rows = None  # cached (rows, scales, companies) of live chunks
+
+    # --- memory-mapped vector files ---
+
+    def _path(self, filename):
+        return os.path.join(self.persist_directory, filename)
+
+    def _capacity(self):
+        path = self._path(COMPACT_CODES_FILENAME)
+        return os.path.getsize(path) // self.dim if self.dim and os.path.exists(path) else 0
+
+    def _map(self, filename, dtype, capacity, mode):
+        return np.memmap(self._path(filename), dtype=dtype, mode=mode, shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, needed):
+        capacity = self._capacity()
+        if needed <= capacity:
+            return
+        # Grow by a quarter at a time - the files are sized by capacity, not by use
+        new_capacity = max(needed, capacity + capacity // 4, 1024)
+        for filename, itemsize in ((COMPACT_CODES_FILENAME, 1), (COMPACT_FULL_FILENAME, 4)):
+            if filename == COMPACT_FULL_FILENAME and not self.full_precision:
+                continue
+            with open(self._path(filename), "ab") as f:
+                f.truncate(new_capacity * self.dim * itemsize)
+        self._codes = self._full = None
+
+    def _vectors(self):
+        capacity = self._capacity()
+        # Remap when another writer has grown the files
+        if capacity and (self._codes is None or self._codes.shape[0] != capacity):
+            self._codes = self._map(COMPACT_CODES_FILENAME, np.int8, capacity, "r+")
+            if self.full_precision:
+                self._full = self._map(COMPACT_FULL_FILENAME, np.float32, capacity, "r+")
+        return self._codes, self._full
+
+    # --- writes ---
+
+    def add_documents(self, documents, ids):
+        vectors = self.embedding_function.embed_documents([doc.page_content for doc in documents])
+        self.add_vectors(ids, vectors, documents)
+
+    def add_vectors(self, ids, vectors, documents):
+        """Upsert chunks with precomputed embeddings."""
+        if not ids:
+            return
+        full, codes, scales = quantize(vectors)
+        with self._lock:
+            if self.dim is None:
+                self.dim = full.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            elif full.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {full.shape[1]} does not match the store ({self.dim})")
+
+            self._delete_locked(ids)
+            rows = self._free_rows(len(ids))
+            self._ensure_capacity(max(rows) + 1)
+            codes_map, full_map = self._vectors()
+            codes_map[rows] = codes
+            if full_map is not None:
+                full_map[rows] = full
+            self._conn.executemany(
+                "INSERT INTO chunks (row, chunk_id, company, scale, content, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                [(row, chunk_id, doc.metadata.get("company"), float(scale), doc.page_content, json.dumps(doc.metadata))
+                 for row, chunk_id, scale, doc in zip(rows, ids, scales, documents)],
+            )
+            self._conn.commit()
+            self._rows = None
+
+    def _free_rows(self, count):
+        """Rows freed by deletes first, then new rows past the end of the file."""
+        free = [row for (row,) in self._conn.execute("SELECT row FROM free_rows ORDER BY row LIMIT ?", (count,))]
+        self._conn.executemany("DELETE FROM free_rows WHERE row = ?", [(row,) for row in free])
+        end = self._conn.execute("SELECT value FROM info WHERE key = 'rows'").fetchone()
+        end = int(end[0]) if end else 0
+        appended = count - len(free)
+        self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('rows', ?)", (str(end + appended),))
+        return free + list(range(end, end + appended))
+
+    def _delete_locked(self, ids=None, company_name=None):
+        if ids:
+            params = [(chunk_id,) for chunk_id in ids]
+            self._conn.executemany("INSERT INTO free_rows SELECT row FROM chunks WHERE chunk_id = ?", params)
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", params)
+        if company_name is not None:
+            self._conn.execute("INSERT INTO free_rows SELECT row FROM chunks WHERE company = ?", (company_name,))
+            self._conn.execute("DELETE FROM chunks WHERE company = ?", (company_name,))
+
+    def delete(self, ids=None, where=None):
+        """Delete chunks by ID, or with ``where={"company": name}``."""
+        with self._lock:
+            self._delete_locked(ids, where["company"] if where else None)
+            self._conn.commit()
+            self._rows = None
+
+    def persist(self):
+        codes_map, full_map = self._vectors()
+        for vectors in (codes_map, full_map):
+            if vectors is not None:
+                vectors.flush()
+
+    # --- reads ---
+
+    def _live_rows(self):
+        if self._rows is None:
+            rows = self._conn.execute("SELECT row, scale, company FROM chunks ORDER BY row").fetchall()
+            self._rows = (
+                np.array([row for row, _, _ in rows], dtype=np.int64),
+                np.array([scale for _, scale, _ in rows], dtype=np.float32),
+                np.array([company or "" for _, _, company in rows], dtype=object),
+            )
+        return self._rows
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get(self, include=None, limit=None, offset=0):
+        rows = self._conn.execute(
+            "SELECT chunk_id, content, metadata FROM chunks ORDER BY row LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        return {
+            "ids": [chunk_id for chunk_id, _, _ in rows],
+            "documents": [content for _, content, _ in rows],
+            "metadatas": [json.loads(metadata) for _, _, metadata in rows],
+        }
+
+    def _candidates(self, query, k, filter):
+        with self._lock:
+            codes_map, full_map = self._vectors()
+            rows, scales, companies = self._live_rows()
+            if codes_map is None or not len(rows):
+                return [], []
+            if filter:
+                wanted = filter["company"]
+                wanted = wanted["$in"] if isinstance(wanted, dict) else [wanted]
+                mask = np.isin(companies, wanted)
+                rows, scales = rows[mask], scales[mask]
+                if not len(rows):
+                    return [], []
+
+            # Approximate scores from the int8 codes
+            approx = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), _SCAN_BLOCK_ROWS):
+                block = rows[start:start + _SCAN_BLOCK_ROWS]
+                approx[start:start + len(block)] = (codes_map[block] @ query) * scales[start:start + len(block)]
+
+            shortlist = min(len(rows), max(k, self.rerank_k))
+            top = np.argpartition(-approx, shortlist - 1)[:shortlist]
+            scores = approx[top]
+            if full_map is not None:
+                # Exact cosine for the shortlist only
+                scores = full_map[rows[top]] @ query
+            order = np.argsort(-scores)[:k]
+            return rows[top][order].tolist(), scores[order].tolist()
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+        if self.dim is not None and query.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match the store ({self.dim})")
+
+        rows, scores = self._candidates(query, k, filter)
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            found = {
+                row: Document(page_content=content, metadata=json.loads(metadata))
+                for row, content, metadata in self._conn.execute(
+                    f"SELECT row, content, metadata FROM chunks WHERE row IN ({placeholders})", rows
+                )
+            }
+        return [(found[row], score) for row, score in zip(rows, scores) if row in found]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k, filter)
+
+    def close(self):
+        self._codes = self._full = None
+        self._conn.close()
@@ -0,0 +1,51 @@
+import io
+import os
+import streamlit as st
+from PIL import Image
+from file_catalog import directory_mtime_ns, pdf_catalog
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _scan_companies(base_dir, mtime_ns):
+    if not mtime_ns:
+        return []
+    with os.scandir(base_dir) as entries:
+        return sorted((entry.name for entry in entries if entry.is_dir()), key=str.lower)
+
+def list_companies(base_dir):
+    """Company folder names, re-listed only when ``base_dir`` changes."""
+    return _scan_companies(base_dir, directory_mtime_ns(base_dir))
+
+def company_pdf_names(base_dir, company_name):
+    return [pdf["name"] for pdf in pdf_catalog(os.path.join(base_dir, company_name))["files"]]
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _scan_logos(logos_dir, mtime_ns):
+    logos = {}
+    if mtime_ns:
+        with os.scandir(logos_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".png") and entry.is_file():
+                    logos[entry.name[:-len(".png")]] = (entry.path, entry.stat().st_mtime_ns)
+    return logos
+
+@st.cache_data(show_spinner=False, max_entries=2000)
+def _logo_thumbnail(path, mtime_ns, size):
+    with Image.open(path) as image:
+        if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            image = image.convert("RGBA")
+        # Twice the display width, for high-DPI screens
+        image.thumbnail((size * 2, size * 2))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+def company_logo(logos_dir, company_name, size):
+    """PNG bytes of a company's logo scaled for ``size`` pixels, or None if it has none.
+
+    The logo folder is listed once per change of its mtime and each thumbnail
+    is made once per logo file version and size, so a rerun opens no images.
+    """
+    logo = _scan_logos(logos_dir, directory_mtime_ns(logos_dir)).get(company_name)
+    if logo is None:
+        return None
+    return _logo_thumbnail(*logo, size)
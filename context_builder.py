@@ -0,0 +1,107 @@
+import re
+from llm_client import count_tokens
+
+# Shortest and longest text shared by consecutive chunks that counts as splitter overlap
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400
+# Below this many tokens of room left, the next passage is dropped rather than cut
+MIN_TRUNCATED_TOKENS = 50
+
+PASSAGE_SEPARATOR = "\n\n"
+
+_CHUNK_INDEX_RE = re.compile(r"-(\d+)$")
+
+def chunk_position(doc):
+    """Index of a chunk within its file, from its chunk ID (None if unknown)."""
+    match = _CHUNK_INDEX_RE.search(doc.metadata.get("chunk_id") or "")
+    return int(match.group(1)) if match else None
+
+def overlap_length(first, second):
+    """Length of the longest suffix of ``first`` that is also a prefix of ``second``."""
+    for length in range(min(len(first), len(second), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+def merge_page_chunks(docs):
+    """Merge the chunks of one page into passages, dropping repeated text.
+
+    Chunks are put back in file order; neighbours that share the splitter's
+    overlap are joined with the overlap kept once, and a chunk whose text is
+    already contained in the passage is dropped.
+    """
+    positions = [chunk_position(doc) for doc in docs]
+    if None not in positions:
+        docs = [doc for _, doc in sorted(zip(positions, docs), key=lambda pair: pair[0])]
+
+    passages = []
+    for doc in docs:
+        text = doc.page_content.strip()
+        if passages:
+            previous = passages[-1]
+            if text in previous["text"]:
+                previous["docs"].append(doc)
+                continue
+            overlap = overlap_length(previous["text"], text)
+            if overlap:
+                previous["text"] += text[overlap:]
+                previous["docs"].append(doc)
+                continue
+        passages.append({"text": text, "docs": [doc]})
+    return passages
+
+def build_context(docs, token_budget):
+    """Assemble the prompt context from ranked chunks within ``token_budget`` tokens.
+
+    Chunks are grouped by (source, page) and merged per page; passages keep
+    the rank of their best chunk. Passages are added until the budget is used
+    up, the last one cut to fit. Returns a dict with the context ``text``,
+    the ``docs`` it was built from and token counts for reporting.
+    """
+    pages = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        pages.setdefault(key, {"rank": rank, "docs": []})["docs"].append(doc)
+
+    passages = []
+    for page in pages.values():
+        for passage in merge_page_chunks(page["docs"]):
+            passages.append((page["rank"], passage))
+    passages.sort(key=lambda item: item[0])
+
+    parts, used_docs, tokens, truncated = [], [], 0, 0
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    for _, passage in passages:
+        passage_tokens = count_tokens(passage["text"]) + (separator_tokens if parts else 0)
+        room = token_budget - tokens
+        if passage_tokens > room:
+            if room >= MIN_TRUNCATED_TOKENS:
+                # ~4 characters per token, as count_tokens assumes
+                parts.append(passage["text"][:room * 4])
+                used_docs.extend(passage["docs"])
+                tokens += count_tokens(parts[-1])
+                truncated += 1
+            break
+        parts.append(passage["text"])
+        used_docs.extend(passage["docs"])
+        tokens += passage_tokens
+
+    return {
+        "text": PASSAGE_SEPARATOR.join(parts),
+        "docs": used_docs,
+        "tokens": tokens,
+        "retrieved_tokens": sum(count_tokens(doc.page_content) for doc in docs),
+        "budget": token_budget,
+        "chunks": len(docs),
+        "passages": len(parts),
+        "truncated": truncated,
+    }
+
+def describe_context(context):
+    """One-line summary of a ``build_context`` result for the UI."""
+    summary = (f"🧾 Context: {context['tokens']} tokens in {context['passages']} passages "
+               f"(from {context['chunks']} chunks, {context['retrieved_tokens']} tokens retrieved; "
+               f"budget {context['budget']})")
+    if context["truncated"]:
+        summary += " - last passage cut to fit"
+    return summary
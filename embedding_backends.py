@@ -0,0 +1,117 @@
+import os
+import platform
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Sentence-transformers model used for every store
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_REPO = f"sentence-transformers/{EMBEDDING_MODEL}"
+EMBEDDING_DIM = 384
+# "torch" (sentence-transformers), "onnx" (ONNX Runtime, float32) or "onnx-int8" (ONNX Runtime, int8 weights)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# Intra-op threads for inference, 0 lets the runtime decide
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))
+# Texts per inference call
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+# Longest input in tokens, as in the sentence-transformers model config
+EMBEDDING_MAX_TOKENS = 256
+
+def default_onnx_file(backend):
+    """ONNX export to load from the model repo for this backend and CPU."""
+    if os.getenv("EMBEDDING_ONNX_FILE"):
+        return os.getenv("EMBEDDING_ONNX_FILE")
+    if backend != "onnx-int8":
+        return "onnx/model.onnx"
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    # AVX2 kernels run on any x86-64 CPU of the last decade
+    return "onnx/model_quint8_avx2.onnx"
+
+class OnnxEmbeddings(Embeddings):
+    """``all-MiniLM-L6-v2`` on ONNX Runtime, without loading PyTorch.
+
+    Reproduces the sentence-transformers pipeline (mean pooling over the
+    attention mask, then L2 normalisation), so vectors match those already
+    in the stores; the int8 export is within rounding of them. Texts are
+    sorted by length before batching to keep padding small.
+    """
+
+    def __init__(self, onnx_file="onnx/model.onnx", threads=None, batch_size=None):
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size or EMBEDDING_BATCH_SIZE
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(EMBEDDING_REPO, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        threads = EMBEDDING_THREADS if threads is None else threads
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(EMBEDDING_REPO, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+def create_embeddings(backend=None):
+    """Build the embedding model for the configured backend."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(default_onnx_file(backend))
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+    if EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+    return SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+
+def embedding_signature(backend=None):
+    """Key for cached vectors - backends produce slightly different floats for the same text."""
+    backend = backend or EMBEDDING_BACKEND
+    return EMBEDDING_MODEL if backend == "torch" else f"{EMBEDDING_MODEL}:{backend}"
+
+def store_embedding_info():
+    """What a store's vectors were made with, recorded in its manifest."""
+    return {"model": EMBEDDING_MODEL, "dim": EMBEDDING_DIM, "backend": EMBEDDING_BACKEND}
+
+def is_compatible_store(embedding_info):
+    """Whether vectors made as described by ``embedding_info`` can be queried with the current model.
+
+    Backends of the same model share one vector space; a different model or
+    dimension needs a rebuild. Stores from before this was recorded used the
+    default model.
+    """
+    embedding_info = embedding_info or {"model": EMBEDDING_MODEL, "dim": EMBEDDING_DIM}
+    return embedding_info.get("model") == EMBEDDING_MODEL and embedding_info.get("dim") == EMBEDDING_DIM
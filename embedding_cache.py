@@ -0,0 +1,129 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from langchain_core.embeddings import Embeddings
+from metrics import timed
+
+# Size ceiling for the on-disk embedding cache, least recently used vectors are evicted first
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", 512))
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that stores document vectors in SQLite.
+
+    Vectors are keyed by (model name, SHA-256 of the chunk text), so unchanged
+    chunks never hit the model again - across relearns, splitter tweaks and
+    processes. Query embeddings are passed straight through.
+    """
+
+    def __init__(self, embeddings, model_name, cache_path, max_mb=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_bytes = (EMBEDDING_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   model TEXT NOT NULL,
+                   text_hash TEXT NOT NULL,
+                   vector BLOB NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (model, text_hash)
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def _lookup(self, hashes):
+        found = {}
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model_name, *batch],
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, self.model_name, key) for key in found],
+            )
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        rows = [(self.model_name, key, array("f", vector).tobytes(), now) for key, vector in items]
+        # Rows another process stored meanwhile are replaced, not added
+        for start in range(0, len(rows), 500):
+            batch = [row[1] for row in rows[start:start + 500]]
+            placeholders = ",".join("?" * len(batch))
+            self._size_bytes -= self._conn.execute(
+                f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model_name, *batch],
+            ).fetchone()[0]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        self._size_bytes += sum(len(row[2]) for row in rows)
+        if self._size_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used vectors until the cache is back under 90% of its ceiling."""
+        target = int(self.max_bytes * 0.9)
+        while self._size_bytes > target:
+            rows = self._conn.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                self._size_bytes = 0
+                break
+            victims = []
+            for rowid, size in rows:
+                victims.append((rowid,))
+                self._size_bytes -= size
+                if self._size_bytes <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(text) for text in texts]
+        with self._lock:
+            cached = self._lookup(list(set(hashes)))
+            self._conn.commit()
+
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            with timed("embed_model"):
+                vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self._store(computed.items())
+                self._conn.commit()
+            cached.update(computed)
+
+        return [cached[key] for key in hashes]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
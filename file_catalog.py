@@ -0,0 +1,55 @@
+import os
+import streamlit as st
+
+# PDF download payloads kept in memory, least recently used are dropped first
+PDF_BYTES_CACHE_ENTRIES = int(os.getenv("PDF_BYTES_CACHE_ENTRIES", 16))
+
+def directory_mtime_ns(path):
+    """Modification time of a directory (0 if it is missing); changes when files are added or removed."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+@st.cache_data(show_spinner=False, max_entries=1000)
+def _scan_pdf_directory(pdf_dir, mtime_ns):
+    files = []
+    if mtime_ns:
+        with os.scandir(pdf_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".pdf") and entry.is_file():
+                    stat = entry.stat()
+                    files.append({
+                        "name": entry.name,
+                        "path": entry.path,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                    })
+    files.sort(key=lambda pdf: pdf["name"].lower())
+    return {"files": files, "count": len(files), "size": sum(pdf["size"] for pdf in files)}
+
+def pdf_catalog(pdf_dir):
+    """Names, sizes and mtimes of the PDFs in a directory.
+
+    Cached per directory and recomputed only when the directory's mtime
+    changes, so reruns don't stat every file.
+    """
+    return _scan_pdf_directory(pdf_dir, directory_mtime_ns(pdf_dir))
+
+def library_summary(pdf_dirs):
+    """Total PDF count and size over several directories, from their catalogs."""
+    catalogs = [pdf_catalog(pdf_dir) for pdf_dir in pdf_dirs]
+    return {
+        "count": sum(catalog["count"] for catalog in catalogs),
+        "size": sum(catalog["size"] for catalog in catalogs),
+    }
+
+@st.cache_data(show_spinner=False, max_entries=PDF_BYTES_CACHE_ENTRIES)
+def _read_pdf(path, mtime_ns, size):
+    with open(path, "rb") as f:
+        return f.read()
+
+def pdf_bytes(path):
+    """File contents for a download button, cached until the file changes."""
+    stat = os.stat(path)
+    return _read_pdf(path, stat.st_mtime_ns, stat.st_size)
@@ -1,12 +1,32 @@
+import gc
 import os
 import time
+import json
 import shutil
-import sqlite3
+import hashlib
+import threading
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import psutil
 import streamlit as st
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import Chroma
-from langchain.embeddings import SentenceTransformerEmbeddings
+from embedding_cache import CachedEmbeddings
+from embedding_backends import create_embeddings, embedding_signature, store_embedding_info, is_compatible_store
+from vectorstore_registry import invalidate_vectorstore
+from answer_cache import invalidate_company_answers
+from chunk_dedup import ChunkDeduplicator, DEDUP_ENABLED
+from lexical_index import LexicalIndex, LEXICAL_INDEX_FILENAME
+import metrics
+from metrics import timed, company_context
+from compact_store import CompactVectorStore, VECTOR_STORAGE
+from pdf_extractors import extract_pages, extractor_signature, page_ranges
+from chunking import split_pages, chunker_signature
+from store_versions import (current_store_directory, stage_version, resumable_version, publish_version,
+                            discard_version, collect_old_versions, release_chroma_client)
+from store_health import check_store, describe_problems
+from unified_index import (UNIFIED_INDEX, UNIFIED_INDEX_DIRNAME, unified_index_directory,
+                           store_layout, purge_company)
 
 __import__('pysqlite3')
 import sys
@@ -15,8 +35,13 @@ sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 # --- NEW: Cached function to load the embedding model ---
 @st.cache_resource
 def load_embedding_model():
-    """Loads the sentence transformer model only once."""
-    return SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    """Loads the configured embedding backend only once, behind the on-disk embedding cache."""
+    cache_root = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+    return CachedEmbeddings(
+        create_embeddings(),
+        model_name=embedding_signature(),
+        cache_path=os.path.join(cache_root, "embedding_cache.sqlite3"),
+    )
 
 # Helper to detect cloud
 def is_streamlit_cloud():
@@ -26,22 +51,8 @@ def clean_vectorstore_directory(persist_directory):
     """Clean up vectorstore directory completely with better error handling"""
     if os.path.exists(persist_directory):
         try:
-            # Force close any open database connections
-            for root, dirs, files in os.walk(persist_directory):
-                for file in files:
-                    if file.endswith('.sqlite3') or file.endswith('.db'):
-                        db_path = os.path.join(root, file)
-                        try:
-                            # Try to close any open connections
-                            conn = sqlite3.connect(db_path)
-                            conn.close()
-                        except:
-                            pass
-            
-            # Wait a bit for connections to close
-            time.sleep(1)
-            
-            # Remove the directory
+            # Chroma keeps its client for a path open for the life of the process
+            release_chroma_client(persist_directory)
             shutil.rmtree(persist_directory)
             print(f"🧹 Cleaned up directory: {persist_directory}")
         except Exception as e:
@@ -59,126 +70,740 @@ def clean_vectorstore_directory(persist_directory):
     # Ensure directory exists
     os.makedirs(persist_directory, exist_ok=True)
 
-def ingest_company_pdfs(company_name: str, persist_directory: str = None):
-    pdf_folder = os.path.join("data/pdfs", company_name)
+# Companies write one shared store and lexical index in unified mode, so only one ingests at a time
+_unified_index_lock = threading.Lock()
 
-    # Always use a safe directory if none is passed
-    if persist_directory is None:
-        base_path = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
-        persist_directory = os.path.join(base_path, company_name)
+MANIFEST_FILENAME = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+# Minimum seconds between manifest checkpoints while chunks are being written
+MANIFEST_SAVE_INTERVAL = 5
 
-    print("🗂️ Using vectorstore path:", persist_directory)
+def file_sha256(file_path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    # Check if PDF folder exists and has PDFs
-    if not os.path.exists(pdf_folder):
-        raise ValueError(f"PDF folder not found: {pdf_folder}")
-    
-    pdf_files = [f for f in os.listdir(pdf_folder) if f.endswith(".pdf")]
-    if not pdf_files:
-        raise ValueError(f"No PDF files found in: {pdf_folder}")
+def make_chunk_id(filename, file_hash, index, company_name=None):
+    """Stable chunk ID derived from the file name, its content hash and chunk position.
 
-    print(f"📄 Found {len(pdf_files)} PDF files")
+    ``company_name`` namespaces the ID, for stores shared by several companies.
+    """
+    source = f"{company_name}/{filename}" if company_name else filename
+    file_key = hashlib.sha1(f"{source}:{file_hash}".encode("utf-8")).hexdigest()[:16]
+    return f"{file_key}-{index:05d}"
+
+def make_section_chunk_id(filename, section, page, index, company_name=None):
+    """Chunk ID from the file name, section path and position on the page.
+
+    Unlike ``make_chunk_id`` it doesn't depend on the file's content hash, so
+    the chunks of unchanged pages keep their IDs when the PDF is revised.
+    """
+    source = f"{company_name}/{filename}" if company_name else filename
+    file_key = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    section_key = hashlib.sha1(section.encode("utf-8")).hexdigest()[:8]
+    return f"{file_key}-{section_key}-{page:05d}{index:03d}"
 
-    # Clean up old vectorstore completely
-    clean_vectorstore_directory(persist_directory)
+def load_manifest(persist_directory):
+    """Load the ingestion manifest stored next to the Chroma files, or None if missing/unreadable."""
+    manifest_path = os.path.join(persist_directory, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read manifest {manifest_path}: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or not isinstance(manifest.get("files"), dict):
+        print("⚠️ Manifest format not recognised - a full rebuild is required")
+        return None
+    return manifest
 
-    # Load and process PDFs
-    all_chunks = []
+def save_manifest(persist_directory, manifest):
+    """Atomically write the ingestion manifest."""
+    os.makedirs(persist_directory, exist_ok=True)
+    manifest_path = os.path.join(persist_directory, MANIFEST_FILENAME)
+    tmp_path = manifest_path + ".tmp"
+    manifest["updated_at"] = time.time()
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def new_manifest(company_name):
+    return {"version": MANIFEST_VERSION, "company": company_name, "store": store_layout(),
+            "storage": VECTOR_STORAGE, "embedding": store_embedding_info(), "files": {}}
+
+def diff_pdf_folder(pdf_folder, pdf_files, manifest):
+    """Compare the PDFs on disk against the manifest.
+
+    Returns (changed, removed): ``changed`` maps filename -> file info for new or
+    modified PDFs, and for PDFs extracted or chunked with different settings;
+    ``removed`` lists manifest entries whose PDF is gone. Files whose size and
+    mtime match the manifest are trusted without re-hashing.
+    """
+    known = manifest["files"]
+    extractor, chunker = extractor_signature(), chunker_signature()
+    changed = {}
     for filename in pdf_files:
-        print(f"📖 Processing: {filename}")
         file_path = os.path.join(pdf_folder, filename)
-        
-        try:
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
-            
-            if not pages:
-                print(f"⚠️ No pages found in {filename}")
-                continue
-                
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000, 
-                chunk_overlap=200,
-                length_function=len
+        stat = os.stat(file_path)
+        entry = known.get(filename)
+        # Entries from before these were recorded were made with PyPDFLoader and 1000/200 windows
+        if entry and (entry.get("extractor", "pypdf") != extractor
+                      or entry.get("chunker", chunker_signature("recursive")) != chunker):
+            entry = None
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            continue
+
+        file_hash = file_sha256(file_path)
+        if entry and entry["sha256"] == file_hash:
+            # Touched but not modified - just refresh the stat info
+            entry["size"] = stat.st_size
+            entry["mtime_ns"] = stat.st_mtime_ns
+            continue
+
+        changed[filename] = {
+            "path": file_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_hash,
+            "chunk_ids": [],
+        }
+
+    removed = [filename for filename in known if filename not in pdf_files]
+    return changed, removed
+
+# Number of processes used to parse and split PDFs in parallel
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+# Chunks embedded and written to the vectorstore per batch
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 256))
+# Soft ceiling (MB) on the ingesting process; buffered chunks are flushed early above it
+INGEST_MEMORY_LIMIT_MB = int(os.getenv("INGEST_MEMORY_LIMIT_MB", 2048))
+
+class NoChunksError(ValueError):
+    """Raised when a company's PDFs produce no chunks at all."""
+
+class IngestCancelled(Exception):
+    """Raised from a progress callback to stop an ingestion run."""
+
+def no_progress(stage, message=None, **counters):
+    pass
+
+def load_and_split_pdf(file_path, timings=None, page_range=None, extractor=None, split=True):
+    """Load a PDF (or ``page_range`` of it) and split it into chunks.
+
+    Returns (page_count, chunks), or the unsplit page Documents when ``split``
+    is false. ``timings``, if given, receives the seconds spent parsing and
+    splitting.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    page_count, pages = extract_pages(file_path, page_range, extractor)
+    timings["parse"] = time.perf_counter() - start
+    if not pages or not split:
+        return page_count, pages
+
+    start = time.perf_counter()
+    chunks = split_pages(pages)
+    timings["split"] = time.perf_counter() - start
+    return page_count, chunks
+
+def process_pdf_file(filename, file_path, page_range=None, extractor=None):
+    """Worker entry point: parse and split one PDF, or parse one page range of it.
+
+    Returns (filename, page_count, chunks, error, timings) so failures are
+    reported, and timings recorded, by the caller instead of the pool. Page
+    ranges come back unsplit (as page Documents): sections run across range
+    boundaries, so a file is split once all its pages are in.
+    """
+    timings = {}
+    try:
+        page_count, chunks = load_and_split_pdf(file_path, timings, page_range, extractor,
+                                                split=page_range is None)
+        return filename, page_count, chunks, None, timings
+    except Exception as e:
+        # Exceptions are sent back as text - not every exception type pickles
+        return filename, 0, [], str(e) or repr(e), timings
+
+def merge_pdf_results(results):
+    """Combine the results of a file's page ranges, given in page order, into one and split it."""
+    if len(results) == 1:
+        return results[0]
+    filename = results[0][0]
+    timings = {}
+    for _, _, _, _, part_timings in results:
+        for stage, seconds in part_timings.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    errors = [error for _, _, _, error, _ in results if error is not None]
+    if errors:
+        return filename, 0, [], errors[0], timings
+    pages = [page for _, _, part_pages, _, _ in results for page in part_pages]
+    start = time.perf_counter()
+    try:
+        chunks = split_pages(pages)
+    except Exception as e:
+        return filename, 0, [], str(e) or repr(e), timings
+    timings["split"] = timings.get("split", 0.0) + time.perf_counter() - start
+    return filename, sum(page_count for _, page_count, _, _, _ in results), chunks, None, timings
+
+def iter_processed_pdfs(files, max_workers=None, extractor=None):
+    """Parse and split PDFs in a process pool, yielding results as each file finishes.
+
+    ``files`` maps filename -> file path. Long PDFs are split into page ranges
+    (see ``pdf_extractors.page_ranges``) that are parsed in parallel and put
+    back together in page order. At most two tasks per worker are in flight,
+    so parsed chunks never pile up faster than the writer consumes them.
+    Small batches run in-process to avoid the pool start-up cost.
+    """
+    tasks = [(filename, file_path, page_range, extractor)
+             for filename, file_path in files.items() for page_range in page_ranges(file_path, extractor)]
+    expected = {}
+    for filename, _, _, _ in tasks:
+        expected[filename] = expected.get(filename, 0) + 1
+    parts = {filename: [] for filename in expected}
+
+    def finish(task, result):
+        """Store a task's result; returns the file's merged result once all its ranges are in."""
+        filename, _, page_range, _ = task
+        parts[filename].append((page_range[0] if page_range else 0, result))
+        if len(parts[filename]) < expected[filename]:
+            return None
+        done = sorted(parts.pop(filename), key=lambda part: part[0])
+        return merge_pdf_results([part_result for _, part_result in done])
+
+    max_workers = max(1, min(max_workers or INGEST_WORKERS, len(tasks)))
+    if max_workers == 1:
+        for task in tasks:
+            result = finish(task, process_pdf_file(*task))
+            if result is not None:
+                yield result
+        return
+
+    ranges = f" ({len(tasks)} page ranges)" if len(tasks) > len(files) else ""
+    print(f"⚙️ Parsing {len(files)} PDFs{ranges} with {max_workers} worker processes")
+    # Spawn rather than fork: the Streamlit server is multi-threaded
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        queued = iter(tasks)
+        in_flight = {}
+        while True:
+            while len(in_flight) < max_workers * 2:
+                task = next(queued, None)
+                if task is None:
+                    break
+                in_flight[pool.submit(process_pdf_file, *task)] = task
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = finish(in_flight.pop(future), future.result())
+                if result is not None:
+                    yield result
+
+def assign_chunk_ids(filename, info, chunks, company_name=None):
+    """Set ``chunk_id`` and ``company`` on each chunk; returns {page: page hash} for section chunks."""
+    namespace = company_name if UNIFIED_INDEX else None
+    pages, positions = {}, {}
+    for i, chunk in enumerate(chunks):
+        page_hash = chunk.metadata.pop("page_hash", None)
+        if page_hash is None:
+            chunk.metadata["chunk_id"] = make_chunk_id(filename, info["sha256"], i, namespace)
+        else:
+            page = chunk.metadata.get("page") or 0
+            index = positions[page] = positions.get(page, -1) + 1
+            chunk.metadata["chunk_id"] = make_section_chunk_id(
+                filename, chunk.metadata.get("section", ""), page, index, namespace
             )
-            chunks = splitter.split_documents(pages)
-            
-            if chunks:
-                all_chunks.extend(chunks)
-                print(f"✅ Added {len(chunks)} chunks from {filename}")
-            else:
-                print(f"⚠️ No chunks created from {filename}")
-                
-        except Exception as e:
-            print(f"❌ Error processing {filename}: {e}")
+            pages[str(page)] = page_hash
+        chunk.metadata["company"] = company_name
+    return pages
+
+def reuse_unchanged_pages(chunks, pages, previous):
+    """Split a revised file's chunks into those of unchanged pages, already stored, and the rest.
+
+    A page is unchanged when its hash (text, starting section and chunker
+    settings) matches the one in the file's ``previous`` manifest entry;
+    its chunks then have the same IDs and text as the stored ones. Returns
+    (reused IDs, their fingerprints, chunks to write). A page that had chunks
+    dropped as duplicates is written again, so deduplication can check them
+    against what the file holds now - the chunk they duplicated may be gone.
+    """
+    if not previous or not previous.get("pages"):
+        return [], [], chunks
+    stored_ids = previous["chunk_ids"]
+    fingerprints = previous.get("fingerprints", [])
+    if DEDUP_ENABLED and len(fingerprints) != len(stored_ids):
+        # Stored without fingerprints - the deduplicator couldn't be seeded with them
+        return [], [], chunks
+    stored = dict(zip(stored_ids, fingerprints)) if DEDUP_ENABLED else dict.fromkeys(stored_ids)
+
+    by_page = {}
+    for chunk in chunks:
+        by_page.setdefault(str(chunk.metadata.get("page") or 0), []).append(chunk)
+
+    reused_ids, reused_fingerprints, to_write = [], [], []
+    for page, page_chunks in by_page.items():
+        ids = [chunk.metadata["chunk_id"] for chunk in page_chunks]
+        unchanged = previous["pages"].get(page) == pages.get(page)
+        if unchanged and all(chunk_id in stored for chunk_id in ids):
+            reused_ids.extend(ids)
+            if DEDUP_ENABLED:
+                reused_fingerprints.extend(stored[chunk_id] for chunk_id in ids)
+        else:
+            to_write.extend(page_chunks)
+    return reused_ids, reused_fingerprints, to_write
+
+def iter_file_chunks(results, changed, progress=no_progress, company_name=None, previous=None):
+    """Report per-file results and yield (filename, info, chunks) for files that parsed.
+
+    Chunk IDs and the ``company`` metadata field are assigned here. Files that
+    failed are marked ``None`` in ``changed`` so their manifest entry (and
+    chunks) are left untouched. ``previous`` maps filename -> manifest entry
+    of revised files whose unchanged pages can be kept as stored; the yielded
+    chunks then leave those pages out, while ``info["chunk_ids"]`` lists every
+    chunk of the file, reused ones first.
+    """
+    for files_done, (filename, page_count, chunks, error, timings) in enumerate(results, start=1):
+        info = changed[filename]
+        info["extractor"] = extractor_signature()
+        info["chunker"] = chunker_signature()
+        for stage, seconds in timings.items():
+            metrics.record(f"ingest_{stage}", seconds)
+        print(f"📖 Processed: {filename}")
+        progress("parsing", f"Processed {filename}", files_done=files_done, files_total=len(changed))
+
+        if error is not None:
+            print(f"❌ Error processing {filename}: {error}")
+            # Leave the manifest entry untouched so the file is retried next time
+            changed[filename] = None
             continue
 
-    if not all_chunks:
-        raise ValueError("No chunks were created from any PDF files")
+        if not page_count:
+            print(f"⚠️ No pages found in {filename}")
+        elif not chunks:
+            print(f"⚠️ No chunks created from {filename}")
+        else:
+            info["pages"] = assign_chunk_ids(filename, info, chunks, company_name)
+            reused_ids, reused_fingerprints, chunks = reuse_unchanged_pages(
+                chunks, info["pages"], (previous or {}).get(filename)
+            )
+            info["chunk_ids"] = reused_ids + [chunk.metadata["chunk_id"] for chunk in chunks]
+            info["fingerprints"] = reused_fingerprints
+            if reused_ids:
+                print(f"♻️ Kept {len(reused_ids)} chunks of unchanged pages in {filename}")
+            print(f"✅ Added {len(chunks)} chunks from {filename}")
+
+        yield filename, info, chunks
+
+def iter_deduplicated_chunks(file_chunks, dedup):
+    """Drop chunks that duplicate (exactly or nearly) a chunk already kept.
+
+    Each file's manifest entry records the fingerprints of its kept chunks,
+    which seed the next incremental run, and the files its dropped chunks
+    duplicated (``dedup_against``), so it is re-processed if one of those goes away.
+    """
+    for filename, info, chunks in file_chunks:
+        # Chunks kept from unchanged pages come first in the file's IDs
+        reused = len(info["chunk_ids"]) - len(chunks)
+        kept_ids, fingerprints = info["chunk_ids"][:reused], info.get("fingerprints", [])[:reused]
+        for fingerprint in fingerprints:
+            dedup.add(fingerprint, filename)
+        # Kept pages have no dropped chunks, so only the chunks checked here can depend on other files
+        kept, duplicated_files = [], set()
+        for chunk in chunks:
+            fingerprint, duplicate = dedup.check(chunk.page_content, filename)
+            if duplicate is None:
+                kept.append(chunk)
+                kept_ids.append(chunk.metadata["chunk_id"])
+                fingerprints.append(fingerprint)
+            elif duplicate[1] != filename:
+                duplicated_files.add(duplicate[1])
+
+        if len(kept) < len(chunks):
+            print(f"🧹 Skipped {len(chunks) - len(kept)} duplicate chunks in {filename}")
+        info["chunk_ids"] = kept_ids
+        info["fingerprints"] = fingerprints
+        info["dedup_against"] = sorted(duplicated_files)
+        yield filename, info, kept
+
+def current_rss_mb():
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+def write_chunks_in_batches(vectordb, manifest, persist_directory, file_chunks,
+                            batch_size=None, memory_limit_mb=None, progress=no_progress, lexical_index=None):
+    """Embed and upsert chunks in fixed-size batches as files stream in.
+
+    A file's old chunks that it no longer has are deleted when its new ones
+    arrive (chunks whose ID it keeps are overwritten or, for unchanged pages,
+    left as they are), and its manifest
+    entry is committed once all of its chunks have been written, so an
+    interrupted run leaves a manifest that matches the store. If the process
+    RSS goes above ``memory_limit_mb`` the buffer is flushed early. Chunks
+    are mirrored into ``lexical_index`` when one is given.
+    Returns the number of chunks written.
+    """
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    memory_limit_mb = INGEST_MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+
+    buffer = []
+    buffer_ids = []
+    pending_files = []  # [filename, info, chunks still buffered]
+    written = 0
+    last_saved = time.monotonic()
+
+    def flush(count):
+        nonlocal buffer, buffer_ids, written, last_saved
+        if count:
+            with timed("ingest_embed_write"):
+                vectordb.add_documents(documents=buffer[:count], ids=buffer_ids[:count])
+                if lexical_index is not None:
+                    lexical_index.add(buffer_ids[:count], buffer[:count])
+            written += count
+            buffer, buffer_ids = buffer[count:], buffer_ids[count:]
+            print(f"🧠 Embedded and stored {written} chunks")
+            progress("embedding", f"Embedded and stored {written} chunks", chunks_written=written)
+
+        # Commit manifest entries of files that are now fully written
+        remaining = count
+        while pending_files and pending_files[0][2] <= remaining:
+            filename, info, buffered = pending_files.pop(0)
+            remaining -= buffered
+            manifest["files"][filename] = info
+        if pending_files:
+            pending_files[0][2] -= remaining
+        # The manifest grows with the corpus, so checkpoint it periodically rather than per batch
+        if time.monotonic() - last_saved > MANIFEST_SAVE_INTERVAL:
+            save_manifest(persist_directory, manifest)
+            last_saved = time.monotonic()
 
-    print(f"📊 Total chunks to process: {len(all_chunks)}")
+    try:
+        for filename, info, chunks in file_chunks:
+            old_entry = manifest["files"].get(filename)
+            if old_entry and old_entry["chunk_ids"]:
+                keep = set(info["chunk_ids"])
+                stale_ids = [chunk_id for chunk_id in old_entry["chunk_ids"] if chunk_id not in keep]
+                if stale_ids:
+                    vectordb.delete(ids=stale_ids)
+                    if lexical_index is not None:
+                        lexical_index.delete(stale_ids)
+
+            buffer.extend(chunks)
+            buffer_ids.extend(chunk.metadata["chunk_id"] for chunk in chunks)
+            pending_files.append([filename, info, len(chunks)])
+            del chunks
+
+            while len(buffer) >= batch_size:
+                flush(batch_size)
+
+            if memory_limit_mb and current_rss_mb() > memory_limit_mb:
+                print(f"⚠️ Memory above {memory_limit_mb} MB - flushing {len(buffer)} buffered chunks early")
+                flush(len(buffer))
+                gc.collect()
+
+        flush(len(buffer))
+    finally:
+        # Also keeps whatever was fully written when the run is cancelled, for the next run to resume
+        save_manifest(persist_directory, manifest)
+    return written
+
+def backfill_lexical_index(vectordb, lexical, page_size=1000):
+    """Index the chunks already in Chroma, for stores built before the lexical index existed."""
+    print("🔤 Building lexical index from the existing vectorstore...")
+    offset = 0
+    while True:
+        page = vectordb.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        lexical.add_texts(page["ids"], page["documents"], page["metadatas"])
+        offset += len(page["ids"])
+    print(f"🔤 Indexed {offset} existing chunks")
+
+def open_vector_store(store_directory, embeddings):
+    """Open the Chroma store, or the int8 compact store when VECTOR_STORAGE=compact."""
+    if VECTOR_STORAGE == "compact":
+        return CompactVectorStore(store_directory, embeddings)
+    return Chroma(
+        persist_directory=store_directory,
+        embedding_function=embeddings,
+        client_settings=None  # Use default settings
+    )
+
+def sync_company_vectorstore(company_name, pdf_folder, pdf_files, persist_directory,
+                             full_rebuild=False, max_workers=None, batch_size=None, progress=no_progress):
+    """One ingestion pass: diff against the manifest and stream the changes into the store.
+
+    A company store is built in a staged version - a copy of the published one,
+    or an empty one for a full rebuild - and published when it is complete, so
+    readers never see a half-built store. A run that is cancelled or fails
+    leaves its staged version behind and the next run resumes it, as long as
+    no other version was published meanwhile. In unified mode the chunks go to
+    the shared store beside ``persist_directory``, which then only holds the
+    company's manifest.
+    """
+    versioned = not UNIFIED_INDEX
+    live_directory = persist_directory
+    if UNIFIED_INDEX:
+        live_directory = unified_index_directory(os.path.dirname(persist_directory))
+        os.makedirs(live_directory, exist_ok=True)
+    else:
+        live_directory = current_store_directory(persist_directory)
+    manifest_directory = live_directory if versioned else persist_directory
+    resumed = None
+    if versioned and not full_rebuild:
+        resumed = resumable_version(persist_directory)
+        if resumed is not None:
+            print(f"⏯️ Resuming unpublished store version {os.path.basename(resumed)}")
+            manifest_directory = resumed
+
+    manifest = None if full_rebuild else load_manifest(manifest_directory)
+    if manifest is not None and (manifest.get("store", "company") != store_layout()
+                                 or manifest.get("storage", "chroma") != VECTOR_STORAGE):
+        print("⚠️ Manifest was written for a different store layout - a full rebuild is required")
+        manifest = None
+    if manifest is not None and not is_compatible_store(manifest.get("embedding")):
+        print(f"⚠️ Store was embedded with {manifest['embedding']} - a full rebuild is required")
+        manifest = None
+    repair_lexical = False
+    if versioned and manifest is not None:
+        # A resumed version may hold chunks of a file whose manifest entry wasn't committed yet
+        problems = check_store(manifest_directory, None if resumed else manifest)
+        if any(part == "vectors" for part, _ in problems):
+            print(f"⚠️ Store failed its integrity check ({describe_problems(problems)}) - a full rebuild is required")
+            manifest = None
+        elif problems:
+            print(f"⚠️ Lexical index failed its integrity check ({describe_problems(problems)}) - rebuilding it")
+            repair_lexical = True
+        elif manifest["files"] and not os.path.exists(os.path.join(manifest_directory, LEXICAL_INDEX_FILENAME)):
+            # Built before the lexical index existed
+            repair_lexical = True
+    purge_shared_store = False
+    rebuild = manifest is None
+    if rebuild:
+        # No usable manifest - we can't tell what the store contains, so start clean
+        print("🧹 Doing a full rebuild")
+        if not versioned:
+            clean_vectorstore_directory(persist_directory)
+        manifest = new_manifest(company_name)
+        # The shared store can't be wiped, only this company's chunks in it
+        purge_shared_store = UNIFIED_INDEX
+
+    changed, removed = diff_pdf_folder(pdf_folder, pdf_files, manifest)
+    print(f"🔎 {len(changed)} new/changed, {len(removed)} removed, "
+          f"{len(pdf_files) - len(changed)} unchanged PDF files")
+    # Revised files can keep the stored chunks of their unchanged pages
+    previous = {filename: manifest["files"][filename] for filename in changed if filename in manifest["files"]}
+
+    dedup = None
+    if DEDUP_ENABLED:
+        # Files whose duplicates were dropped in favour of a file that is now
+        # changing or going away must be re-processed to get those chunks back
+        affected = set(changed) | set(removed)
+        while True:
+            dependents = [
+                filename for filename, entry in manifest["files"].items()
+                if filename not in affected and affected.intersection(entry.get("dedup_against", ()))
+            ]
+            if not dependents:
+                break
+            print(f"🔁 Re-processing {len(dependents)} files that shared duplicates with changed files")
+            for filename in dependents:
+                changed[filename] = {**manifest["files"][filename], "chunk_ids": []}
+                affected.add(filename)
+
+        dedup = ChunkDeduplicator()
+        for filename, entry in manifest["files"].items():
+            if filename not in affected:
+                for fingerprint in entry.get("fingerprints", ()):
+                    dedup.add(fingerprint, filename)
+
+    store_directory, staging = live_directory, None
+    if resumed is not None and not rebuild:
+        store_directory = staging = resumed
+    elif versioned and (rebuild or changed or removed or repair_lexical or not manifest["files"]):
+        if resumed is not None:
+            discard_version(resumed)
+        staging = stage_version(persist_directory, copy_from=None if rebuild else live_directory)
+        store_directory = manifest_directory = staging
+        print(f"🏗️ Building store version {os.path.basename(staging)}")
+    if staging and repair_lexical:
+        # Rebuilt from the vectorstore by the backfill below
+        for name in os.listdir(staging):
+            if name.startswith(LEXICAL_INDEX_FILENAME):
+                os.remove(os.path.join(staging, name))
+
+    if versioned and staging is None:
+        # Nothing to write - the published version is only opened, the way readers open it
+        print(f"✅ Vectorstore for {company_name} is already up to date")
+        return open_vector_store(live_directory, load_embedding_model())
 
     # --- MODIFIED: Create embeddings using the cached function ---
     print("🧠 Loading embedding model...")
     embeddings = load_embedding_model()
     print("✅ Embedding model loaded.")
 
-    # Create vectorstore with enhanced retry logic
-    max_retries = 5
-    for attempt in range(max_retries):
-        try:
-            print(f"🔄 Creating vectorstore (attempt {attempt + 1}/{max_retries})")
-            
-            # Extra cleanup on retry attempts
-            if attempt > 0:
-                clean_vectorstore_directory(persist_directory)
-                time.sleep(2)  # Wait longer on retries
-            
-            # Create vectorstore with explicit settings
-            vectordb = Chroma.from_documents(
-                documents=all_chunks,
-                embedding=embeddings,
-                persist_directory=persist_directory,
-                client_settings=None  # Use default settings
-            )
-            
-            # Test the vectorstore immediately
+    vectordb = open_vector_store(store_directory, embeddings)
+
+    # BM25 index of the same chunks, kept beside the Chroma files
+    lexical = LexicalIndex(os.path.join(store_directory, LEXICAL_INDEX_FILENAME))
+    published, resumable = False, True
+
+    def publish():
+        nonlocal published
+        if staging:
+            publish_version(persist_directory, staging)
+            published = True
+            collect_old_versions(persist_directory)
+
+    try:
+        if purge_shared_store:
+            print(f"🗑️ Removing {company_name} chunks from the unified index")
+            purge_company(vectordb, lexical, company_name)
+
+        if manifest["files"] and not lexical.count():
+            backfill_lexical_index(vectordb, lexical)
+
+        if not changed and not removed and manifest["files"]:
+            print(f"✅ Vectorstore for {company_name} is already up to date")
+            save_manifest(manifest_directory, manifest)
+            # Staged only to rebuild the lexical index
+            publish()
+            return vectordb
+
+        progress("parsing", f"Parsing {len(changed)} PDFs", files_done=0, files_total=len(changed), chunks_written=0)
+
+        # Chunks of removed PDFs go first
+        for filename in removed:
+            stale_ids = manifest["files"].pop(filename)["chunk_ids"]
+            if stale_ids:
+                print(f"🗑️ Deleting {len(stale_ids)} chunks of removed file {filename}")
+                vectordb.delete(ids=stale_ids)
+                lexical.delete(stale_ids)
+        save_manifest(manifest_directory, manifest)
+
+        # Parse -> split -> embed -> upsert, one bounded batch at a time
+        files_to_process = {filename: info["path"] for filename, info in changed.items()}
+        results = iter_processed_pdfs(files_to_process, max_workers)
+        file_chunks = iter_file_chunks(results, changed, progress, company_name, previous)
+        if dedup is not None:
+            file_chunks = iter_deduplicated_chunks(file_chunks, dedup)
+        written = write_chunks_in_batches(vectordb, manifest, manifest_directory, file_chunks, batch_size,
+                                          progress=progress, lexical_index=lexical)
+        if dedup is not None:
+            print(dedup.summary())
+
+        total_chunks = sum(len(entry["chunk_ids"]) for entry in manifest["files"].values())
+        if not total_chunks:
+            raise NoChunksError("No chunks were created from any PDF files")
+
+        progress("verifying", "Verifying vectorstore")
+
+        # Test the vectorstore immediately
+        if VECTOR_STORAGE != "compact":
             print("🔍 Testing vectorstore connection...")
             vectordb._client.heartbeat()
-            
-            # Do a quick search test
-            test_results = vectordb.similarity_search("test", k=1)
-            print(f"🔍 Vectorstore test: {len(test_results)} results found")
-            
-            # Persist the vectorstore
-            print("💾 Persisting vectorstore...")
+
+        # Do a quick search test
+        test_results = vectordb.similarity_search("test", k=1)
+        print(f"🔍 Vectorstore test: {len(test_results)} results found")
+
+        # Persist the vectorstore
+        print("💾 Persisting vectorstore...")
+        with timed("ingest_persist"):
             vectordb.persist()
-            
-            # Final verification
-            print("✅ Final verification...")
-            vectordb._client.heartbeat()
-            
-            print(f"✅ Successfully created vectorstore for {company_name}")
-            print(f"📈 Ingested {len(all_chunks)} chunks")
-            
+
+        publish()
+
+        print(f"✅ Successfully updated vectorstore for {company_name}")
+        print(f"📈 Ingested {written} chunks ({total_chunks} in store)")
+        return vectordb
+    except NoChunksError:
+        resumable = False
+        raise
+    finally:
+        lexical.close()
+        # Readers keep the published version
+        if staging and not published and resumable:
+            release_chroma_client(staging)
+            print(f"⏸️ Kept unpublished store version {os.path.basename(staging)} for the next run to resume")
+        elif staging and not published:
+            discard_version(staging)
+
+def invalidate_company_caches(company_name, persist_directory):
+    """Drop the shared vectorstore and cached answers of a company whose store changed."""
+    invalidate_vectorstore(company_name)
+    if UNIFIED_INDEX:
+        invalidate_vectorstore(UNIFIED_INDEX_DIRNAME)
+    invalidate_company_answers(os.path.dirname(persist_directory), company_name)
+
+def ingest_company_pdfs(company_name: str, persist_directory: str = None, full_rebuild: bool = False,
+                        max_workers: int = None, batch_size: int = None, progress_callback=None):
+    """Bring a company's vectorstore in line with its PDF folder.
+
+    Only new or modified PDFs are parsed and embedded; chunks of removed or
+    modified PDFs are deleted. A manifest of what was ingested is kept in the
+    persist directory. Pass ``full_rebuild=True`` to rebuild everything from scratch.
+    PDFs are parsed in ``max_workers`` processes (default ``INGEST_WORKERS``) and
+    embedded/written ``batch_size`` chunks at a time (default ``EMBED_BATCH_SIZE``),
+    so memory use does not grow with the size of the library.
+    ``progress_callback(stage, message=None, **counters)`` receives progress
+    reports and may raise ``IngestCancelled`` to stop the run.
+    """
+    pdf_folder = os.path.join("data/pdfs", company_name)
+
+    # Always use a safe directory if none is passed
+    if persist_directory is None:
+        base_path = "/mount/tmp/vectorstores" if is_streamlit_cloud() else "vectorstores"
+        persist_directory = os.path.join(base_path, company_name)
+
+    print("🗂️ Using vectorstore path:", persist_directory)
+    metrics.configure(os.path.join(os.path.dirname(persist_directory), metrics.METRICS_FILENAME))
+
+    # Check if PDF folder exists and has PDFs
+    if not os.path.exists(pdf_folder):
+        raise ValueError(f"PDF folder not found: {pdf_folder}")
+
+    pdf_files = [f for f in os.listdir(pdf_folder) if f.endswith(".pdf")]
+    if not pdf_files:
+        raise ValueError(f"No PDF files found in: {pdf_folder}")
+
+    print(f"📄 Found {len(pdf_files)} PDF files")
+
+    # A failed incremental update is retried once as a full rebuild; the
+    # published store version keeps serving readers throughout
+    attempts = 1 if full_rebuild else 2
+    for attempt in range(attempts):
+        try:
+            if attempt > 0:
+                # The store can't be patched - rebuild it from scratch
+                print("🔧 Incremental update failed - falling back to a full rebuild")
+                full_rebuild = True
+
+            with _unified_index_lock if UNIFIED_INDEX else nullcontext(), \
+                    company_context(company_name), timed("ingest_total"):
+                vectordb = sync_company_vectorstore(
+                    company_name, pdf_folder, pdf_files, persist_directory,
+                    full_rebuild=full_rebuild, max_workers=max_workers, batch_size=batch_size,
+                    progress=progress_callback or no_progress
+                )
+            # Readers reopen the store so they see the new chunks, and answers
+            # based on the old chunks are no longer served
+            invalidate_company_caches(company_name, persist_directory)
             return vectordb
-            
+
+        except (NoChunksError, IngestCancelled):
+            # Nothing a retry would fix; readers of the unified index still need to see what was written
+            if UNIFIED_INDEX:
+                invalidate_company_caches(company_name, persist_directory)
+            raise
+
         except Exception as e:
             print(f"❌ Attempt {attempt + 1} failed: {e}")
-            
-            # Check if it's the specific tenants table error
-            if "no such table: tenants" in str(e):
-                print("🔧 Detected tenants table error - doing deep cleanup...")
-                # Force remove everything and wait longer
-                clean_vectorstore_directory(persist_directory)
-                time.sleep(3)
-            
-            if attempt < max_retries - 1:
-                print(f"⏳ Waiting {2 * (attempt + 1)} seconds before retry...")
-                time.sleep(2 * (attempt + 1))  # Exponential backoff
-            else:
-                print("❌ All attempts failed")
-                raise e
+            if UNIFIED_INDEX:
+                invalidate_company_caches(company_name, persist_directory)
+            if attempt == attempts - 1:
+                raise
 
 if __name__ == "__main__":
     # Test function
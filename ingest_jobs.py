@@ -0,0 +1,143 @@
+import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unified_index import UNIFIED_INDEX
+
+# Number of companies that may ingest at the same time (always 1 with a unified index, which they all write)
+INGEST_MAX_CONCURRENT_JOBS = int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", 2))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class IngestJobRunner:
+    """Runs per-company ingestion in background threads, tracked in a SQLite table.
+
+    The Streamlit script only submits jobs and polls their rows; progress is
+    written by the ingestion itself through ``progress_callback``. Cancelling
+    sets a flag that the next progress report turns into ``IngestCancelled``.
+    """
+
+    def __init__(self, db_path, max_concurrent=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=1 if UNIFIED_INDEX else max_concurrent or INGEST_MAX_CONCURRENT_JOBS,
+            thread_name_prefix="ingest-job",
+        )
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingest_jobs (
+                   id INTEGER PRIMARY KEY,
+                   company TEXT NOT NULL,
+                   status TEXT NOT NULL,
+                   stage TEXT,
+                   files_done INTEGER NOT NULL DEFAULT 0,
+                   files_total INTEGER NOT NULL DEFAULT 0,
+                   chunks_written INTEGER NOT NULL DEFAULT 0,
+                   message TEXT,
+                   error TEXT,
+                   cancel_requested INTEGER NOT NULL DEFAULT 0,
+                   created_at REAL NOT NULL,
+                   started_at REAL,
+                   finished_at REAL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_company ON ingest_jobs (company, id)")
+        # Jobs from a previous server process can't still be running
+        self._conn.execute(
+            "UPDATE ingest_jobs SET status = 'failed', error = 'Interrupted by a server restart', "
+            "finished_at = ? WHERE status IN ('queued', 'running')",
+            (time.time(),),
+        )
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def submit(self, company_name, persist_directory, **ingest_kwargs):
+        """Queue ingestion for a company; returns the job id (the active one if already queued)."""
+        with self._lock:
+            active = self._conn.execute(
+                "SELECT id FROM ingest_jobs WHERE company = ? AND status IN ('queued', 'running')",
+                (company_name,),
+            ).fetchone()
+            if active:
+                return active["id"]
+            job_id = self._conn.execute(
+                "INSERT INTO ingest_jobs (company, status, stage, message, created_at) "
+                "VALUES (?, 'queued', 'queued', 'Waiting for a free worker', ?)",
+                (company_name, time.time()),
+            ).lastrowid
+            self._conn.commit()
+
+        self._pool.submit(self._run, job_id, company_name, persist_directory, ingest_kwargs)
+        return job_id
+
+    def cancel(self, job_id):
+        self._execute("UPDATE ingest_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+
+    def get(self, job_id):
+        rows = self._query("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def latest_for_company(self, company_name):
+        rows = self._query(
+            "SELECT * FROM ingest_jobs WHERE company = ? ORDER BY id DESC LIMIT 1", (company_name,)
+        )
+        return rows[0] if rows else None
+
+    def active_jobs(self):
+        return self._query("SELECT * FROM ingest_jobs WHERE status IN ('queued', 'running') ORDER BY id")
+
+    def _run(self, job_id, company_name, persist_directory, ingest_kwargs):
+        # Imported here so the runner can be created without loading the ingestion stack
+        from ingest import ingest_company_pdfs, IngestCancelled
+
+        job = self.get(job_id)
+        if job["cancel_requested"]:
+            self._finish(job_id, "cancelled", "Cancelled before it started")
+            return
+
+        self._execute(
+            "UPDATE ingest_jobs SET status = 'running', stage = 'starting', message = 'Scanning PDFs', "
+            "started_at = ? WHERE id = ?",
+            (time.time(), job_id),
+        )
+
+        def report(stage, message=None, **counters):
+            fields = {"stage": stage, **counters}
+            if message is not None:
+                fields["message"] = message
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            self._execute(f"UPDATE ingest_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            if self.get(job_id)["cancel_requested"]:
+                raise IngestCancelled(f"Ingestion of {company_name} was cancelled")
+
+        try:
+            ingest_company_pdfs(company_name, persist_directory=persist_directory,
+                                progress_callback=report, **ingest_kwargs)
+        except IngestCancelled as e:
+            self._finish(job_id, "cancelled", str(e))
+        except Exception as e:
+            self._finish(job_id, "failed", "Ingestion failed", error=str(e))
+        else:
+            self._finish(job_id, "succeeded", "Knowledge base updated")
+
+    def _finish(self, job_id, status, message, error=None):
+        self._execute(
+            "UPDATE ingest_jobs SET status = ?, stage = 'done', message = ?, error = ?, finished_at = ? "
+            "WHERE id = ?",
+            (status, message, error, time.time(), job_id),
+        )
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import sqlite3
+
+LEXICAL_INDEX_FILENAME = "lexical_index.sqlite3"
+
+# Words too common in insurance documents to help a keyword match
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "the", "this", "to", "we", "what",
+    "when", "where", "which", "who", "why", "will", "with", "you",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+class LexicalIndex:
+    """On-disk BM25 inverted index of a company's chunks (SQLite FTS5).
+
+    Chunks live in a plain table keyed by chunk ID, with an external-content
+    FTS5 index kept in sync by triggers, so deletes by chunk ID are indexed
+    lookups. Lives beside the Chroma files in the persist directory.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                rowid INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                content, content='chunks', content_rowid='rowid'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, content) VALUES (new.rowid, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+            END;
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def open_existing(cls, persist_directory):
+        """Open a company's index read-only, or return None if it has none."""
+        path = os.path.join(persist_directory, LEXICAL_INDEX_FILENAME)
+        if not os.path.exists(path):
+            return None
+        return cls(path, readonly=True)
+
+    def add(self, ids, documents):
+        self.add_texts(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+
+    def add_texts(self, ids, texts, metadatas):
+        # Explicit delete rather than INSERT OR REPLACE, which would skip the FTS delete trigger
+        self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+        self._conn.executemany(
+            "INSERT INTO chunks (chunk_id, content, metadata) VALUES (?, ?, ?)",
+            [(chunk_id, text, json.dumps(metadata or {})) for chunk_id, text, metadata in zip(ids, texts, metadatas)],
+        )
+        self._conn.commit()
+
+    def delete(self, ids):
+        self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+        self._conn.commit()
+
+    def delete_company(self, company_name):
+        self._conn.execute("DELETE FROM chunks WHERE json_extract(metadata, '$.company') = ?", (company_name,))
+        self._conn.commit()
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    @staticmethod
+    def build_match_query(query):
+        terms = [t for t in _TOKEN_RE.findall(query.lower()) if t not in STOPWORDS]
+        if not terms:
+            return None
+        # Quoted so form codes and numbers are taken literally
+        return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+    def search(self, query, k=20, companies=None):
+        """Return up to ``k`` (chunk_id, content, metadata, score) best BM25 matches.
+
+        ``companies`` restricts the matches to chunks tagged with those companies.
+        """
+        match = self.build_match_query(query)
+        if match is None:
+            return []
+        company_clause = ""
+        params = [match]
+        if companies:
+            company_clause = (" AND json_extract(c.metadata, '$.company') IN (%s)"
+                              % ", ".join("?" * len(companies)))
+            params.extend(companies)
+        rows = self._conn.execute(
+            f"""SELECT c.chunk_id, c.content, c.metadata, bm25(chunks_fts) AS score
+               FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid
+               WHERE chunks_fts MATCH ?{company_clause}
+               ORDER BY score
+               LIMIT ?""",
+            (*params, k),
+        ).fetchall()
+        # FTS5 bm25() is negative, lower is better - flip it so higher is better
+        return [(chunk_id, content, json.loads(metadata), -score) for chunk_id, content, metadata, score in rows]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import timed
+
+# Base URL of the Gemini REST API - point it at a local mock server for testing
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+
+# Longest we are willing to wait for rate-limit budget before giving up on every model
+GEMINI_MAX_QUEUE_SECONDS = float(os.getenv("GEMINI_MAX_QUEUE_SECONDS", 10))
+
+# Gemini model fallback configuration (ordered by preference)
+# (model, requests per minute, tokens per minute, requests per day, context tokens per prompt)
+GEMINI_MODELS = [
+    ("gemini-2.5-flash", 15, 1_000_000, 1000, 4000),
+    ("gemini-2.5-flash-lite-preview-06-17", 15, 250_000, 1000, 3000),
+    ("gemini-2.0-flash", 10, 250_000, 250, 3000),
+    ("gemini-2.0-flash-lite", 30, 1_000_000, 200, 2500),
+    ("gemini-2.5-pro", 5, 250_000, 100, 6000),
+]
+
+def count_tokens(text):
+    """Rough size of a text in tokens (~4 characters per token)."""
+    return len(text) // 4
+
+def estimate_tokens(payload):
+    """Rough prompt size in tokens."""
+    text = "".join(
+        part.get("text", "")
+        for content in payload.get("contents", [])
+        for part in content.get("parts", [])
+    )
+    return max(1, count_tokens(text))
+
+def context_token_budget(model, models=None):
+    """Tokens of retrieved context to put in one prompt for ``model``.
+
+    The configured context size, but never more than the model's per-minute
+    token quota spread over its per-minute requests.
+    """
+    for name, rpm, tpm, _, context_tokens in (models or GEMINI_MODELS):
+        if name == model:
+            return min(context_tokens, tpm // rpm)
+    raise KeyError(model)
+
+class TokenBucket:
+    """Classic token bucket: ``capacity`` tokens, refilled continuously over ``period`` seconds."""
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until ``amount`` tokens are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        # May go negative: usage reported after the fact is still charged
+        self.tokens -= amount
+
+    def drain(self):
+        self.tokens = min(self.tokens, 0.0)
+
+class GeminiClient:
+    """Pooled, rate-limit aware Gemini client shared by the whole process.
+
+    Keeps HTTP connections alive through one ``requests.Session`` and tracks
+    per-model request/token budgets (RPM, TPM, RPD) with token buckets, so it
+    picks the first model in preference order that still has budget instead
+    of finding out through a 429. Thread-safe.
+    """
+
+    def __init__(self, api_key, models=None, base_url=None, pool_size=16, timeout=60,
+                 max_queue_seconds=None):
+        self.api_key = api_key
+        self.base_url = (base_url or GEMINI_API_BASE).rstrip("/")
+        self.timeout = timeout
+        self.max_queue_seconds = GEMINI_MAX_QUEUE_SECONDS if max_queue_seconds is None else max_queue_seconds
+        self.models = [name for name, _, _, _, _ in (models or GEMINI_MODELS)]
+        self.limits = {
+            name: {
+                "rpm": TokenBucket(rpm, 60),
+                "tpm": TokenBucket(tpm, 60),
+                "rpd": TokenBucket(rpd, 24 * 60 * 60),
+            }
+            for name, rpm, tpm, rpd, _ in (models or GEMINI_MODELS)
+        }
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.models), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def model_url(self, model, method="generateContent"):
+        return f"{self.base_url}/models/{model}:{method}"
+
+    def _wait_time(self, model, tokens, now):
+        buckets = self.limits[model]
+        return max(
+            buckets["rpm"].wait_time(1, now),
+            buckets["tpm"].wait_time(tokens, now),
+            buckets["rpd"].wait_time(1, now),
+        )
+
+    def acquire(self, tokens, exclude=()):
+        """Reserve budget on the preferred model that can serve ``tokens`` soonest.
+
+        Returns the model name, or None if no model frees up within
+        ``max_queue_seconds``.
+        """
+        deadline = time.monotonic() + self.max_queue_seconds
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                candidates = [m for m in self.models if m not in exclude]
+                if not candidates:
+                    return None
+                waits = {model: self._wait_time(model, tokens, now) for model in candidates}
+                for model in candidates:
+                    if waits[model] == 0:
+                        self.limits[model]["rpm"].consume(1)
+                        self.limits[model]["tpm"].consume(tokens)
+                        self.limits[model]["rpd"].consume(1)
+                        return model
+                shortest = min(waits.values())
+
+            if now + shortest > deadline:
+                return None
+            time.sleep(shortest)
+
+    def likely_model(self, tokens=1):
+        """Model the next request of ``tokens`` would most likely go to, without reserving budget."""
+        with self._lock:
+            now = time.monotonic()
+            waits = {model: self._wait_time(model, tokens, now) for model in self.models}
+        return min(self.models, key=lambda model: (waits[model], self.models.index(model)))
+
+    def remaining_budget(self):
+        """Snapshot of the remaining RPM/TPM/RPD budget per model."""
+        with self._lock:
+            now = time.monotonic()
+            snapshot = {}
+            for model, buckets in self.limits.items():
+                for bucket in buckets.values():
+                    bucket._refill(now)
+                snapshot[model] = {name: int(bucket.tokens) for name, bucket in buckets.items()}
+            return snapshot
+
+    def _record_usage(self, model, response, estimated_tokens):
+        try:
+            used = response.json().get("usageMetadata", {}).get("totalTokenCount")
+        except ValueError:
+            return
+        if used and used > estimated_tokens:
+            with self._lock:
+                self.limits[model]["tpm"].consume(used - estimated_tokens)
+
+    def _mark_exhausted(self, model):
+        with self._lock:
+            self.limits[model]["rpm"].drain()
+
+    def post(self, model, payload, method="generateContent", **kwargs):
+        return self.session.post(
+            self.model_url(model, method),
+            params={"key": self.api_key, **kwargs.pop("params", {})},
+            data=json.dumps(payload),
+            timeout=self.timeout,
+            **kwargs,
+        )
+
+    def _send_with_fallback(self, payload, notify, method, stream):
+        notify = notify or (lambda level, message: None)
+        tokens = estimate_tokens(payload)
+        tried = set()
+        response, model = None, None
+
+        while True:
+            # Time spent waiting for rate-limit budget
+            with timed("llm_queue"):
+                next_model = self.acquire(tokens, exclude=tried)
+            if next_model is None:
+                break
+            model = next_model
+            tried.add(model)
+
+            try:
+                # One timing per model tried, so fallback hops show up as extra requests
+                with timed("llm_request"):
+                    if stream:
+                        response = self.post(model, payload, method=method, params={"alt": "sse"}, stream=True)
+                    else:
+                        response = self.post(model, payload, method=method)
+            except requests.RequestException as e:
+                notify("error", f"❌ Error with {model}: {str(e)}")
+                continue
+
+            if response.status_code == 429:
+                notify("warning", f"⚠️ Rate limit reached for {model}, trying next model...")
+                # Our budget estimate was off - stop choosing this model until it refills
+                self._mark_exhausted(model)
+                response.close()
+                continue
+
+            if response.status_code == 200 and not stream:
+                self._record_usage(model, response, tokens)
+            return response, model
+
+        if response is None:
+            response = requests.Response()
+            response.status_code = 429
+            response._content = b"{}"
+        return response, model or self.models[0]
+
+    def generate(self, payload, notify=None):
+        """Send a generateContent request, falling back across models.
+
+        Returns (response, model). If every model is out of budget, a synthetic
+        429 response is returned so callers handle it like a real rate limit.
+        ``notify(level, message)`` receives fallback warnings.
+        """
+        return self._send_with_fallback(payload, notify, "generateContent", stream=False)
+
+    def generate_stream(self, payload, notify=None):
+        """Like ``generate`` but opens a server-sent-events stream.
+
+        Model fallback happens before the first token, on the response status.
+        On a 200 the returned response is still open; read it with
+        ``iter_stream_text``.
+        """
+        return self._send_with_fallback(payload, notify, "streamGenerateContent", stream=True)
+
+def iter_stream_text(response):
+    """Yield text fragments from a streamGenerateContent SSE response as they arrive."""
+    # Gemini sends UTF-8 without a charset, which requests would decode as ISO-8859-1
+    response.encoding = "utf-8"
+    with response:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):].strip())
+            for candidate in event.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
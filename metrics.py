@@ -0,0 +1,183 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Record per-stage timings (set METRICS_ENABLED=false to turn off)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+# Timings older than this are pruned
+METRICS_RETENTION_DAYS = float(os.getenv("METRICS_RETENTION_DAYS", 7))
+# Serve the Prometheus text format on this port (0 = off)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+# Buffered timings are written at least this often
+METRICS_FLUSH_SECONDS = 5
+
+METRICS_FILENAME = "metrics.sqlite3"
+QUANTILES = (0.5, 0.95)
+
+# Company that timings recorded in the current context belong to
+_company = contextvars.ContextVar("metrics_company", default=None)
+
+class MetricsStore:
+    """Per-stage timings in SQLite, summarised as percentiles per stage and company.
+
+    Recording only appends to an in-memory buffer; the buffer is written
+    out every ``METRICS_FLUSH_SECONDS`` or 200 timings, and at exit.
+    """
+
+    def __init__(self, db_path, retention_days=None):
+        self.db_path = db_path
+        self.retention_seconds = (METRICS_RETENTION_DAYS if retention_days is None else retention_days) * 86400
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS timings (
+                   id INTEGER PRIMARY KEY,
+                   stage TEXT NOT NULL,
+                   company TEXT,
+                   seconds REAL NOT NULL,
+                   created_at REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_timings_created ON timings (created_at)")
+        self._conn.commit()
+        atexit.register(self.flush)
+
+    def record(self, stage, seconds, company=None):
+        with self._lock:
+            self._buffer.append((stage, company, seconds, time.time()))
+            due = len(self._buffer) >= 200 or time.monotonic() - self._last_flush > METRICS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not rows:
+                return
+            self._conn.executemany(
+                "INSERT INTO timings (stage, company, seconds, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.execute("DELETE FROM timings WHERE created_at < ?", (time.time() - self.retention_seconds,))
+            self._conn.commit()
+
+    def summary(self, since_seconds=None, by_company=False):
+        """Count, sum and percentiles of the timings, grouped by stage (and company).
+
+        Returns a list of dicts sorted by stage, with ``quantiles`` mapping
+        each of ``QUANTILES`` to seconds.
+        """
+        self.flush()
+        cutoff = time.time() - since_seconds if since_seconds else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, company, seconds FROM timings WHERE created_at >= ?", (cutoff,)
+            ).fetchall()
+
+        groups = {}
+        for stage, company, seconds in rows:
+            key = (stage, company or "") if by_company else (stage, None)
+            groups.setdefault(key, []).append(seconds)
+
+        summary = []
+        for (stage, company), values in sorted(groups.items()):
+            values = np.asarray(values)
+            summary.append({
+                "stage": stage,
+                "company": company,
+                "count": len(values),
+                "sum": float(values.sum()),
+                "quantiles": {q: float(np.quantile(values, q)) for q in QUANTILES},
+            })
+        return summary
+
+    def prometheus_text(self, since_seconds=None):
+        """Timings as a Prometheus summary in the text exposition format."""
+        lines = [
+            "# HELP biblio_stage_seconds Time spent per question and ingestion stage.",
+            "# TYPE biblio_stage_seconds summary",
+        ]
+        for row in self.summary(since_seconds, by_company=True):
+            labels = f'stage="{_escape(row["stage"])}",company="{_escape(row["company"])}"'
+            for q, seconds in row["quantiles"].items():
+                lines.append(f'biblio_stage_seconds{{{labels},quantile="{q}"}} {seconds:.6f}')
+            lines.append(f"biblio_stage_seconds_sum{{{labels}}} {row['sum']:.6f}")
+            lines.append(f"biblio_stage_seconds_count{{{labels}}} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """Serve ``prometheus_text`` at http://0.0.0.0:<port>/metrics from a daemon thread."""
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = store.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+        print(f"📈 Serving metrics on port {port}")
+        return server
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+_store = None
+_store_lock = threading.Lock()
+
+def configure(db_path):
+    """Point this process's timings at ``db_path`` (once; later calls return the same store)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsStore(db_path)
+            if METRICS_PORT:
+                _store.serve(METRICS_PORT)
+        return _store
+
+def get_store():
+    return _store
+
+def record(stage, seconds, company=None):
+    """Record a timing for the current company context; a no-op until ``configure`` is called."""
+    if METRICS_ENABLED and _store is not None:
+        _store.record(stage, seconds, company if company is not None else _company.get())
+
+@contextmanager
+def timed(stage, company=None):
+    """Time the enclosed block as ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, company)
+
+@contextmanager
+def company_context(company_name):
+    """Attribute timings recorded in the enclosed block (in this thread) to a company."""
+    token = _company.set(company_name)
+    try:
+        yield
+    finally:
+        _company.reset(token)
@@ -0,0 +1,111 @@
+import os
+from langchain_core.documents import Document
+
+# "pypdf" (LangChain's PyPDFLoader) or "pymupdf" (faster, keeps tables together, splits large PDFs by page range)
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "pypdf").lower()
+# Detect ruled tables and extract them as Markdown (PyMuPDF only; set PDF_TABLES=false to skip)
+PDF_TABLES = os.getenv("PDF_TABLES", "true").lower() not in ("0", "false", "no")
+# PDFs longer than this are extracted in page ranges of this size, in parallel
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 32))
+# Share of a text block's area that must lie in a table for the block to count as part of it
+TABLE_OVERLAP = 0.5
+
+EXTRACTORS = ("pypdf", "pymupdf")
+
+def extractor_signature(extractor=None):
+    """What a file's chunks were extracted with, recorded per file in the manifest."""
+    extractor = extractor or PDF_EXTRACTOR
+    if extractor == "pymupdf" and PDF_TABLES:
+        return "pymupdf+tables"
+    return extractor
+
+def page_ranges(file_path, extractor=None, pages_per_task=None):
+    """Page ranges ``(start, stop)`` to extract a PDF in, or ``[None]`` for the whole file at once.
+
+    Only the PyMuPDF extractor can start part-way through a file. A PDF that
+    can't be opened gets ``[None]`` so the error is reported by its worker.
+    """
+    extractor = extractor or PDF_EXTRACTOR
+    pages_per_task = pages_per_task or PDF_PAGES_PER_TASK
+    if extractor != "pymupdf":
+        return [None]
+    import fitz
+    try:
+        with fitz.open(file_path) as pdf:
+            page_count = pdf.page_count
+    except Exception:
+        return [None]
+    if page_count <= pages_per_task:
+        return [None]
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+def extract_pages(file_path, page_range=None, extractor=None):
+    """Extract the text of a PDF (or of ``page_range`` of it) as Documents.
+
+    Returns (page_count, documents). Documents carry ``source`` and 0-based
+    ``page`` metadata like PyPDFLoader's; the PyMuPDF extractor returns one
+    Document per run of text and per table on a page, tables marked with
+    ``table=True`` and their ``table_bbox``.
+    """
+    extractor = extractor or PDF_EXTRACTOR
+    if extractor == "pymupdf":
+        return extract_pymupdf(file_path, page_range)
+    if extractor != "pypdf":
+        raise ValueError(f"Unknown PDF_EXTRACTOR: {extractor}")
+    from langchain.document_loaders import PyPDFLoader
+    pages = PyPDFLoader(file_path).load()
+    return len(pages), pages
+
+def extract_pymupdf(file_path, page_range=None):
+    import fitz
+    documents = []
+    with fitz.open(file_path) as pdf:
+        start, stop = page_range or (0, pdf.page_count)
+        for number in range(start, stop):
+            documents.extend(_page_documents(pdf[number], file_path, number))
+    return stop - start, documents
+
+def _page_documents(page, file_path, number):
+    """Text outside tables, and each table as Markdown, in reading order."""
+    tables = []
+    if PDF_TABLES:
+        try:
+            tables = [(table.bbox, table.to_markdown().strip()) for table in page.find_tables().tables]
+        except Exception:
+            # Table detection is best effort; the text is still extracted below
+            tables = []
+
+    segments = []  # (top, text, table bbox or None)
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks", sort=True):
+        if block_type != 0 or not text.strip():
+            continue
+        area = max((x1 - x0) * (y1 - y0), 1e-6)
+        if any(_overlap((x0, y0, x1, y1), bbox) / area > TABLE_OVERLAP for bbox, _ in tables):
+            continue
+        segments.append((y0, text.strip(), None))
+    segments.extend((bbox[1], markdown, bbox) for bbox, markdown in tables if markdown)
+    segments.sort(key=lambda segment: segment[0])
+
+    documents, text_run = [], []
+    metadata = {"source": file_path, "page": number}
+
+    def flush_text():
+        if text_run:
+            documents.append(Document(page_content="\n".join(text_run), metadata={**metadata, "table": False}))
+            text_run.clear()
+
+    for _, text, bbox in segments:
+        if bbox is None:
+            text_run.append(text)
+            continue
+        flush_text()
+        documents.append(Document(page_content=text, metadata={
+            **metadata, "table": True, "table_bbox": ",".join(f"{value:.1f}" for value in bbox),
+        }))
+    flush_text()
+    return documents
+
+def _overlap(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    return width * height if width > 0 and height > 0 else 0.0
@@ -0,0 +1,125 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from retrieval import document_key
+from llm_client import count_tokens
+
+# Re-score retrieved chunks with a cross-encoder before building the prompt (opt-in)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Candidates retrieved for the reranker to choose from
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", 50))
+# Prompt budget for the chunks that are kept, when the caller doesn't pass the model's context budget
+RERANK_TOKEN_BUDGET = int(os.getenv("RERANK_TOKEN_BUDGET", 1500))
+# Time allowed for scoring per question; candidates not scored by then keep their retrieval order
+RERANK_DEADLINE_MS = int(os.getenv("RERANK_DEADLINE_MS", 400))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+# (question, chunk) scores kept in memory
+RERANK_CACHE_SIZE = 20000
+
+class CrossEncoderReranker:
+    """Scores (question, chunk) pairs with a small CPU cross-encoder.
+
+    Candidates are scored in batches, in retrieval order, until the deadline
+    passes, so the best-ranked candidates are always scored first. Scores are
+    cached per question and chunk. Thread-safe.
+    """
+
+    def __init__(self, model_name=None, batch_size=None, cache_size=RERANK_CACHE_SIZE):
+        self.model_name = model_name or RERANK_MODEL
+        self.batch_size = batch_size or RERANK_BATCH_SIZE
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._model = None
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                print(f"🧠 Loading reranker {self.model_name}...")
+                self._model = CrossEncoder(self.model_name, max_length=512)
+            return self._model
+
+    def _cached_scores(self, query, keys):
+        with self._lock:
+            found = {}
+            for key in keys:
+                if (query, key) in self._cache:
+                    self._cache.move_to_end((query, key))
+                    found[key] = self._cache[(query, key)]
+            return found
+
+    def _store(self, query, scores):
+        with self._lock:
+            for key, score in scores.items():
+                self._cache[(query, key)] = score
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def score(self, query, docs, deadline_ms=None):
+        """Return {document key: score} for the candidates scored before the deadline."""
+        deadline_ms = RERANK_DEADLINE_MS if deadline_ms is None else deadline_ms
+        keys = [document_key(doc) for doc in docs]
+        scores = self._cached_scores(query, keys)
+        pending = [(key, doc) for key, doc in zip(keys, docs) if key not in scores]
+        if not pending:
+            return scores
+
+        model = self.model
+        deadline = time.monotonic() + deadline_ms / 1000
+        for start in range(0, len(pending), self.batch_size):
+            if time.monotonic() > deadline:
+                print(f"⏱️ Rerank deadline reached - {len(pending) - start} candidates left in retrieval order")
+                break
+            batch = pending[start:start + self.batch_size]
+            batch_scores = model.predict([(query, doc.page_content) for _, doc in batch],
+                                         batch_size=self.batch_size)
+            new_scores = {key: float(score) for (key, _), score in zip(batch, batch_scores)}
+            self._store(query, new_scores)
+            scores.update(new_scores)
+        return scores
+
+    def rerank(self, query, docs, top_n, token_budget=None, deadline_ms=None):
+        """Best ``top_n`` candidates that fit ``token_budget``, scored ones first."""
+        token_budget = RERANK_TOKEN_BUDGET if token_budget is None else token_budget
+        scores = self.score(query, docs, deadline_ms)
+        ranked = sorted(
+            range(len(docs)),
+            key=lambda i: (document_key(docs[i]) not in scores, -scores.get(document_key(docs[i]), 0.0), i),
+        )
+
+        kept, used = [], 0
+        for i in ranked:
+            tokens = count_tokens(docs[i].page_content)
+            # The best chunk is always kept, even on its own over budget
+            if kept and used + tokens > token_budget:
+                continue
+            kept.append(docs[i])
+            used += tokens
+            if len(kept) == top_n:
+                break
+        return kept
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """Process-wide reranker, the model is loaded on first use."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+        return _reranker
+
+def rerank_documents(query, docs, top_n, token_budget=None):
+    """Rerank retrieved chunks when RERANK_ENABLED, otherwise keep the first ``top_n``.
+
+    ``token_budget`` should be the prompt context budget of the model the
+    answer goes to (default ``RERANK_TOKEN_BUDGET``).
+    """
+    if not RERANK_ENABLED or len(docs) <= 1:
+        return docs[:top_n]
+    return get_reranker().rerank(query, docs, top_n, token_budget=token_budget)
@@ -0,0 +1,86 @@
+import os
+import hashlib
+from langchain_core.documents import Document
+from lexical_index import LexicalIndex
+from unified_index import company_filter, group_by_company
+
+# Combine BM25 keyword matches with vector search (set HYBRID_RETRIEVAL=false for vector only)
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() not in ("0", "false", "no")
+# Candidates taken from each retriever before fusion
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", 20))
+# Reciprocal rank fusion constant - higher flattens the influence of top ranks
+RRF_K = 60
+
+def document_key(doc):
+    """Identity used to merge the same chunk coming from different retrievers."""
+    return doc.metadata.get("chunk_id") or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+def reciprocal_rank_fusion(ranked_lists, k, rrf_k=RRF_K):
+    """Merge ranked Document lists: each document scores sum(1 / (rrf_k + rank))."""
+    scores = {}
+    documents = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+def lexical_search(persist_directory, query, k, companies=None):
+    """BM25 matches from a lexical index as Documents ([] if there is no index)."""
+    index = LexicalIndex.open_existing(persist_directory)
+    if index is None:
+        return []
+    try:
+        results = index.search(query, k, companies=companies)
+    finally:
+        index.close()
+    return [Document(page_content=content, metadata={**metadata, "chunk_id": chunk_id})
+            for chunk_id, content, metadata, _ in results]
+
+def hybrid_search(vectorstore, persist_directory, query, query_embedding, k=4, fetch_k=None, company=None):
+    """Top ``k`` chunks for a query, fusing vector and BM25 rankings with reciprocal rank fusion.
+
+    Pass ``company`` to search a shared (unified) index for one company's chunks.
+    """
+    search_filter = company_filter([company]) if company else None
+    if not HYBRID_RETRIEVAL:
+        return vectorstore.similarity_search_by_vector(query_embedding, k=k, filter=search_filter)
+
+    fetch_k = max(k, fetch_k or HYBRID_FETCH_K)
+    dense = vectorstore.similarity_search_by_vector(query_embedding, k=fetch_k, filter=search_filter)
+    sparse = lexical_search(persist_directory, query, fetch_k, companies=[company] if company else None)
+    if not sparse:
+        return dense[:k]
+    return reciprocal_rank_fusion([dense, sparse], k)
+
+def hybrid_search_by_company(vectorstore, persist_directory, query, query_embedding, companies, k=4, fetch_k=None):
+    """Top ``k`` chunks per company from a shared index, returned as {company: docs}.
+
+    One filtered query per retriever covers every company. Companies that get
+    fewer than ``k`` vector hits from it (the pool is ranked globally) are
+    topped up with a query of their own.
+    """
+    fetch_k = max(k, fetch_k or HYBRID_FETCH_K)
+    pool_size = fetch_k * len(companies)
+    dense = group_by_company(
+        vectorstore.similarity_search_by_vector(query_embedding, k=pool_size, filter=company_filter(companies))
+    )
+    for company in companies:
+        if len(dense.get(company, ())) < k:
+            dense[company] = vectorstore.similarity_search_by_vector(
+                query_embedding, k=fetch_k, filter=company_filter([company])
+            )
+
+    sparse = {}
+    if HYBRID_RETRIEVAL:
+        sparse = group_by_company(lexical_search(persist_directory, query, pool_size, companies=companies))
+
+    results = {}
+    for company in companies:
+        if sparse.get(company):
+            results[company] = reciprocal_rank_fusion([dense[company], sparse[company]], k)
+        else:
+            results[company] = dense[company][:k]
+    return results
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+from compact_store import COMPACT_DB_FILENAME, VECTOR_STORAGE
+from lexical_index import LEXICAL_INDEX_FILENAME
+
+CHROMA_DB_FILENAME = "chroma.sqlite3"
+CHROMA_COLLECTION = "langchain"
+# Tables every Chroma store has; "no such table: tenants" means the store was never initialised
+CHROMA_TABLES = ("tenants", "databases", "collections", "segments", "embeddings")
+COMPACT_TABLES = ("info", "chunks", "free_rows")
+LEXICAL_TABLES = ("chunks", "chunks_fts")
+
+class StoreCorruptError(Exception):
+    """A vectorstore failed its integrity check."""
+
+def expected_chunk_count(manifest):
+    """Chunks the manifest says the store holds."""
+    return sum(len(entry["chunk_ids"]) for entry in manifest["files"].values())
+
+def _check_database(path, tables):
+    """Problems with one SQLite file, and an open read-only connection to it (None if it can't be used)."""
+    if not os.path.exists(path):
+        return [f"{os.path.basename(path)} is missing"], None
+    name = os.path.basename(path)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            problems = [f"{name} failed quick_check: {result}"]
+        else:
+            present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            missing = [table for table in tables if table not in present]
+            problems = [f"{name} has no {', '.join(missing)} table"] if missing else []
+    except sqlite3.DatabaseError as e:
+        problems = [f"{name} can't be read: {e}"]
+    if problems:
+        conn.close()
+        return problems, None
+    return [], conn
+
+def _check_count(name, count, expected):
+    if expected is not None and count != expected:
+        return [f"{name} holds {count} chunks, the manifest lists {expected}"]
+    return []
+
+def check_store(store_directory, manifest=None):
+    """Check a store's files without opening it; returns a list of (part, problem), empty if healthy.
+
+    ``part`` is "vectors" (the Chroma or compact store - only a rebuild fixes
+    it) or "lexical" (the keyword index, which can be rebuilt from the
+    vectors). Runs SQLite's ``quick_check``, looks for the tables the store
+    needs and, given the store's ``manifest``, compares chunk counts.
+    """
+    if not os.path.isdir(store_directory):
+        return [("vectors", "store directory is missing")]
+    expected = expected_chunk_count(manifest) if manifest else None
+    problems = []
+
+    if VECTOR_STORAGE == "compact":
+        found, conn = _check_database(os.path.join(store_directory, COMPACT_DB_FILENAME), COMPACT_TABLES)
+        query, params = "SELECT COUNT(*) FROM chunks", ()
+    else:
+        found, conn = _check_database(os.path.join(store_directory, CHROMA_DB_FILENAME), CHROMA_TABLES)
+        # Rows of the collection's metadata segment - what collection.count() reports
+        query = ("SELECT COUNT(*) FROM embeddings e JOIN segments s ON e.segment_id = s.id "
+                 "JOIN collections c ON s.collection = c.id WHERE c.name = ? AND s.scope = 'METADATA'")
+        params = (CHROMA_COLLECTION,)
+    problems.extend(("vectors", problem) for problem in found)
+    if conn is not None:
+        try:
+            count = conn.execute(query, params).fetchone()[0]
+            problems.extend(("vectors", problem) for problem in _check_count("vectorstore", count, expected))
+        except sqlite3.DatabaseError as e:
+            problems.append(("vectors", f"chunks can't be counted: {e}"))
+        finally:
+            conn.close()
+
+    lexical_path = os.path.join(store_directory, LEXICAL_INDEX_FILENAME)
+    # Stores built before the lexical index existed get one on their next ingestion
+    if os.path.exists(lexical_path):
+        found, conn = _check_database(lexical_path, LEXICAL_TABLES)
+        problems.extend(("lexical", problem) for problem in found)
+        if conn is not None:
+            try:
+                count = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+                problems.extend(("lexical", problem) for problem in _check_count("lexical index", count, expected))
+            finally:
+                conn.close()
+    return problems
+
+def describe_problems(problems):
+    return "; ".join(problem for _, problem in problems)
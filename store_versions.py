@@ -0,0 +1,140 @@
+import os
+import shutil
+from datetime import datetime, timezone
+
+# Published versions kept per company, the current one included; older ones are deleted
+STORE_VERSIONS_KEEP = max(2, int(os.getenv("STORE_VERSIONS_KEEP", 2)))
+
+VERSIONS_DIRNAME = "versions"
+CURRENT_FILENAME = "CURRENT"
+# Present in a version directory until it is published; holds the name of the version it was staged on
+STAGING_MARKER = ".staging"
+
+def versions_directory(persist_directory):
+    return os.path.join(persist_directory, VERSIONS_DIRNAME)
+
+def current_version(persist_directory):
+    """Name of the published version, or None for an unversioned (or missing) store."""
+    try:
+        with open(os.path.join(persist_directory, CURRENT_FILENAME), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def current_store_directory(persist_directory):
+    """Directory readers should open: the published version, or ``persist_directory``
+    itself for stores built before versioning."""
+    version = current_version(persist_directory)
+    if version is None:
+        return persist_directory
+    return os.path.join(versions_directory(persist_directory), version)
+
+def stage_version(persist_directory, copy_from=None):
+    """Create an unpublished version directory, seeded with a copy of ``copy_from`` if given.
+
+    Readers keep using the published version until ``publish_version``.
+    """
+    base = current_version(persist_directory) or ""
+    name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    staging = os.path.join(versions_directory(persist_directory), name)
+    # Marked before anything is copied, so a half-made copy never looks published
+    os.makedirs(staging)
+    with open(os.path.join(staging, STAGING_MARKER), "w", encoding="utf-8") as f:
+        f.write(base)
+    if copy_from and os.path.isdir(copy_from):
+        # An unversioned store lives beside the versions directory - don't copy that into itself
+        shutil.copytree(copy_from, staging, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(VERSIONS_DIRNAME, CURRENT_FILENAME, STAGING_MARKER))
+    return staging
+
+def resumable_version(persist_directory):
+    """Newest unpublished version staged on the current one, which an interrupted run left behind.
+
+    Returns its directory, or None.
+    """
+    root = versions_directory(persist_directory)
+    if not os.path.isdir(root):
+        return None
+    base = current_version(persist_directory) or ""
+    for name in sorted(os.listdir(root), reverse=True):
+        try:
+            with open(os.path.join(root, name, STAGING_MARKER), "r", encoding="utf-8") as f:
+                if f.read().strip() == base:
+                    return os.path.join(root, name)
+        except FileNotFoundError:
+            continue
+    return None
+
+def publish_version(persist_directory, staging):
+    """Atomically point readers at ``staging``."""
+    os.remove(os.path.join(staging, STAGING_MARKER))
+    pointer = os.path.join(persist_directory, CURRENT_FILENAME)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(staging))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer + ".tmp", pointer)
+    print(f"🔀 Published store version {os.path.basename(staging)}")
+
+def discard_version(staging):
+    """Delete a version that failed to build."""
+    release_chroma_client(staging)
+    shutil.rmtree(staging, ignore_errors=True)
+
+def collect_old_versions(persist_directory, keep=None):
+    """Delete superseded versions, keeping the newest ``keep`` published ones.
+
+    The version before the current one is kept by default, so readers that
+    opened it just before the swap can finish. An unversioned store at the
+    top of ``persist_directory`` counts as the oldest version. Unpublished
+    versions are always deleted - they were staged on an older version and
+    can no longer be resumed.
+    """
+    keep = keep or STORE_VERSIONS_KEEP
+    current = current_version(persist_directory)
+    if current is None:
+        return
+    root = versions_directory(persist_directory)
+    published, abandoned = [], []
+    for name in sorted(os.listdir(root)):
+        if name == current:
+            continue
+        path = os.path.join(root, name)
+        (abandoned if os.path.exists(os.path.join(path, STAGING_MARKER)) else published).append(path)
+
+    legacy = [name for name in os.listdir(persist_directory) if name not in (VERSIONS_DIRNAME, CURRENT_FILENAME)]
+    # Oldest first; None stands for the unversioned store
+    candidates = ([None] if legacy else []) + published
+    expired = candidates[:max(0, len(candidates) - (keep - 1))]
+
+    for path in abandoned + expired:
+        if path is None:
+            release_chroma_client(persist_directory)
+            for name in legacy:
+                legacy_path = os.path.join(persist_directory, name)
+                if os.path.isdir(legacy_path):
+                    shutil.rmtree(legacy_path, ignore_errors=True)
+                else:
+                    os.remove(legacy_path)
+            print("🗑️ Removed the unversioned store")
+        else:
+            release_chroma_client(path)
+            shutil.rmtree(path, ignore_errors=True)
+            print(f"🗑️ Removed old store version {os.path.basename(path)}")
+
+def release_chroma_client(store_directory):
+    """Stop the Chroma client this process keeps for a store directory, if any (best effort).
+
+    Chroma caches one client per path for the life of the process; without
+    this every superseded version would stay loaded.
+    """
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+    except ImportError:
+        return
+    system = getattr(SharedSystemClient, "_identifier_to_system", {}).pop(store_directory, None)
+    if system is not None:
+        try:
+            system.stop()
+        except Exception:
+            pass
@@ -0,0 +1,35 @@
+import os
+
+# Keep every company's chunks in one shared collection, tagged with a ``company``
+# metadata field, instead of one Chroma store per company (opt-in)
+UNIFIED_INDEX = os.getenv("UNIFIED_INDEX", "false").lower() in ("1", "true", "yes")
+
+# Directory of the shared store, under the vectorstore root
+UNIFIED_INDEX_DIRNAME = "_unified"
+
+def unified_index_directory(vectorstore_root):
+    return os.path.join(vectorstore_root, UNIFIED_INDEX_DIRNAME)
+
+def store_layout():
+    """Layout recorded in each manifest, so switching modes forces a rebuild."""
+    return "unified" if UNIFIED_INDEX else "company"
+
+def company_filter(companies):
+    """Chroma metadata filter selecting the chunks of the given companies."""
+    companies = list(companies)
+    if len(companies) == 1:
+        return {"company": companies[0]}
+    return {"company": {"$in": companies}}
+
+def group_by_company(docs):
+    """Split a ranked Document list into per-company ranked lists."""
+    grouped = {}
+    for doc in docs:
+        grouped.setdefault(doc.metadata.get("company"), []).append(doc)
+    return grouped
+
+def purge_company(vectordb, lexical_index, company_name):
+    """Delete every chunk of a company from the shared vector and keyword indexes."""
+    vectordb.delete(where={"company": company_name})
+    if lexical_index is not None:
+        lexical_index.delete_company(company_name)
@@ -0,0 +1,72 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Maximum number of company vectorstores kept open at once in this process
+VECTORSTORE_REGISTRY_SIZE = int(os.getenv("VECTORSTORE_REGISTRY_SIZE", 32))
+
+class VectorstoreRegistry:
+    """Process-wide, thread-safe LRU of open vectorstores, one per company.
+
+    Every Streamlit session shares the same entries, so a company's Chroma
+    client is opened once per process rather than once per browser session.
+    Dropping an entry only drops the reference: sessions may still be
+    querying the store, and Chroma's client for a store version is only
+    stopped when that version's directory is deleted (see ``store_versions``).
+    """
+
+    def __init__(self, max_size=VECTORSTORE_REGISTRY_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # company -> (path, vectorstore)
+        self._lock = threading.Lock()
+        self._open_locks = {}
+
+    def get(self, company_name, vectorstore_path, factory):
+        """Return the open vectorstore for a company, creating it with ``factory()`` if needed."""
+        with self._lock:
+            entry = self._entries.get(company_name)
+            if entry and entry[0] == vectorstore_path:
+                self._entries.move_to_end(company_name)
+                return entry[1]
+            open_lock = self._open_locks.setdefault(company_name, threading.Lock())
+
+        # Only one thread opens a given company; the others wait and reuse it
+        with open_lock:
+            with self._lock:
+                entry = self._entries.get(company_name)
+                if entry and entry[0] == vectorstore_path:
+                    self._entries.move_to_end(company_name)
+                    return entry[1]
+
+            vectorstore = factory()
+
+            with self._lock:
+                self._entries[company_name] = (vectorstore_path, vectorstore)
+                self._entries.move_to_end(company_name)
+                while len(self._entries) > self.max_size:
+                    evicted, _ = self._entries.popitem(last=False)
+                    print(f"♻️ Evicted vectorstore for {evicted}")
+            return vectorstore
+
+    def invalidate(self, company_name):
+        """Drop a company's vectorstore so the next request reopens it."""
+        with self._lock:
+            self._entries.pop(company_name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, company_name):
+        with self._lock:
+            return company_name in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+registry = VectorstoreRegistry()
+
+def invalidate_vectorstore(company_name):
+    """Invalidate a company's shared vectorstore, e.g. after ingestion rewrote it."""
+    registry.invalidate(company_name)